@@ -3,7 +3,14 @@ FastAPI Application Package
 Main application entry point and configuration
 """
 
-from app.main import create_application
-
 __version__ = "1.0.0"
-__all__ = ["create_application"]
\ No newline at end of file
+__all__ = ["create_application"]
+
+
+def __getattr__(name):
+    # Import the application module only when it is asked for, so importing
+    # app.core or app.models does not build the whole app
+    if name == "create_application":
+        from app.main import create_application
+        return create_application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -2,6 +2,7 @@
 AI Agent Schemas
 Pydantic models for AI processing workflow
 """
+from datetime import datetime
 from typing import List, Optional, Dict, Any, Literal
 from pydantic import BaseModel, Field
 from enum import Enum
@@ -53,6 +54,7 @@ class ImageProcessingState(BaseModel):
     image_path: str
     image_data: Optional[bytes] = None
     user_id: str
+    downscale_image: bool = True
     
     # Processing metadata
     start_time: Optional[float] = None
@@ -78,6 +80,8 @@ class ImageProcessingState(BaseModel):
     summary: Optional[str] = None
     explanation: Optional[str] = None
     quiz_questions: List[Dict[str, Any]] = Field(default_factory=list)
+    # Generation steps that fell back to placeholder output
+    generation_failures: List[str] = Field(default_factory=list)
     
     # Routing decisions
     needs_preprocessing: bool = False
@@ -180,7 +184,7 @@ class StudySessionResponse(BaseModel):
     session_id: str
     user_id: str
     result: ProcessingResult
-    created_at: str
+    created_at: datetime
     status: Literal["completed", "failed", "processing"]
 
 
@@ -50,6 +50,11 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Decode-time JPEG downscale target and hard cap on pixel dimensions
+# for images handed to the vision models
+DRAFT_IMAGE_SIZE = (1500, 1500)
+MAX_IMAGE_DIMENSIONS = (2048, 2048)
+
 
 class StudyHelperWorkflow:
     """LangGraph workflow for AI Study Helper"""
@@ -143,11 +148,8 @@ class StudyHelperWorkflow:
     async def validate_image_node(self, state: ImageProcessingState) -> ImageProcessingState:
         """Validate uploaded image"""
         try:
-            # Load and validate image
-            if state.image_data:
-                image = Image.open(io.BytesIO(state.image_data))
-            else:
-                image = Image.open(state.image_path)
+            # Load and validate image; decoding runs off the event loop
+            image = await asyncio.to_thread(self._open_image, state)
             
             # Check format
             if image.format not in settings.SUPPORTED_IMAGE_FORMATS:
@@ -163,9 +165,7 @@ class StudyHelperWorkflow:
             
             # Store image data if not already present
             if not state.image_data:
-                buffer = io.BytesIO()
-                image.save(buffer, format=image.format)
-                state.image_data = buffer.getvalue()
+                state.image_data = await asyncio.to_thread(self._encode_image, image, image.format)
             
             logger.info(f"Image validated successfully: {image.size}, {image.format}")
             return state
@@ -280,31 +280,10 @@ class StudyHelperWorkflow:
             if not state.needs_preprocessing:
                 return state
             
-            # Convert to OpenCV format
-            image = Image.open(io.BytesIO(state.image_data))
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
-            # Apply preprocessing based on quality issues
-            processed_image = cv_image.copy()
-            
-            if "blur" in str(state.quality_issues).lower():
-                # Apply sharpening
-                kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-                processed_image = cv2.filter2D(processed_image, -1, kernel)
-            
-            if "contrast" in str(state.quality_issues).lower():
-                # Enhance contrast
-                processed_image = cv2.convertScaleAbs(processed_image, alpha=1.2, beta=10)
-            
-            if "noise" in str(state.quality_issues).lower():
-                # Reduce noise
-                processed_image = cv2.medianBlur(processed_image, 3)
-            
-            # Convert back to bytes
-            processed_pil = Image.fromarray(cv2.cvtColor(processed_image, cv2.COLOR_BGR2RGB))
-            buffer = io.BytesIO()
-            processed_pil.save(buffer, format="PNG")
-            state.image_data = buffer.getvalue()
+            # OpenCV filtering and PNG encoding are CPU-bound
+            state.image_data = await asyncio.to_thread(
+                self._preprocess_image, state.image_data, str(state.quality_issues).lower()
+            )
             
             logger.info("Image preprocessing completed")
             return state
@@ -386,6 +365,7 @@ class StudyHelperWorkflow:
             
         except Exception as e:
             logger.error(f"Summary generation failed: {e}")
+            state.generation_failures.append("summary")
             state.summary = f"Summary generation failed: {str(e)}. Original content: {state.extracted_text[:200]}..."
             return state
     
@@ -429,6 +409,7 @@ class StudyHelperWorkflow:
             
         except Exception as e:
             logger.error(f"Explanation generation failed: {e}")
+            state.generation_failures.append("explanation")
             state.explanation = f"Explanation generation failed: {str(e)}. Content overview: {state.extracted_text[:300]}..."
             return state
     
@@ -457,6 +438,7 @@ class StudyHelperWorkflow:
             
         except Exception as e:
             logger.error(f"Quiz generation failed: {e}")
+            state.generation_failures.append("quiz")
             # Generate fallback questions based on content
             state.quiz_questions = self._generate_fallback_quiz(state.extracted_text)
             return state
@@ -523,6 +505,60 @@ class StudyHelperWorkflow:
             logger.error(f"Finalization failed: {e}")
             return state
     
+    def _open_image(self, state: ImageProcessingState) -> Image.Image:
+        """Decode the state's image, downscaling images read from disk"""
+        if state.image_data:
+            return Image.open(io.BytesIO(state.image_data))
+        
+        image = Image.open(state.image_path)
+        if state.downscale_image:
+            image = self._downscale_image(image)
+        return image
+    
+    def _encode_image(self, image: Image.Image, image_format: str) -> bytes:
+        """Encode an image to bytes in the given format"""
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format)
+        return buffer.getvalue()
+    
+    def _preprocess_image(self, image_data: bytes, quality_issues: str) -> bytes:
+        """Sharpen, boost contrast and denoise an image according to its quality issues"""
+        # Convert to OpenCV format
+        image = Image.open(io.BytesIO(image_data))
+        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        
+        # Apply preprocessing based on quality issues
+        processed_image = cv_image.copy()
+        
+        if "blur" in quality_issues:
+            # Apply sharpening
+            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+            processed_image = cv2.filter2D(processed_image, -1, kernel)
+        
+        if "contrast" in quality_issues:
+            # Enhance contrast
+            processed_image = cv2.convertScaleAbs(processed_image, alpha=1.2, beta=10)
+        
+        if "noise" in quality_issues:
+            # Reduce noise
+            processed_image = cv2.medianBlur(processed_image, 3)
+        
+        # Convert back to bytes
+        processed_pil = Image.fromarray(cv2.cvtColor(processed_image, cv2.COLOR_BGR2RGB))
+        return self._encode_image(processed_pil, "PNG")
+    
+    def _downscale_image(self, image: Image.Image) -> Image.Image:
+        """Shrink large images while decoding; JPEGs use libjpeg's DCT scaling"""
+        image_format = image.format
+        image.draft("RGB", DRAFT_IMAGE_SIZE)
+        image.load()
+        
+        if image.width > MAX_IMAGE_DIMENSIONS[0] or image.height > MAX_IMAGE_DIMENSIONS[1]:
+            image.thumbnail(MAX_IMAGE_DIMENSIONS, Image.LANCZOS)
+        
+        image.format = image_format
+        return image
+    
     # Conditional Edge Functions
     def should_continue_processing(self, state: ImageProcessingState) -> str:
         """Determine next step after routing"""
@@ -547,7 +583,7 @@ class StudyHelperWorkflow:
             image_bytes = base64.b64decode(image_data)
             image = Image.open(io.BytesIO(image_bytes))
             
-            response = self.gemini_vision_model.generate_content([prompt, image])
+            response = await asyncio.to_thread(self.gemini_vision_model.generate_content, [prompt, image])
             return response.text
         except Exception as e:
             logger.error(f"Gemini Vision API call failed: {e}")
@@ -556,7 +592,7 @@ class StudyHelperWorkflow:
     async def _call_gemini_text(self, prompt: str) -> str:
         """Call Gemini text API"""
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await self.llm.ainvoke([HumanMessage(content=prompt)])
             return response.content
         except Exception as e:
             logger.error(f"Gemini Text API call failed: {e}")
@@ -566,7 +602,7 @@ class StudyHelperWorkflow:
         """Extract text using Google Vision API"""
         try:
             image = vision.Image(content=image_data)
-            response = self.vision_client.text_detection(image=image)
+            response = await asyncio.to_thread(self.vision_client.text_detection, image=image)
             texts = response.text_annotations
             
             if texts:
@@ -582,7 +618,7 @@ class StudyHelperWorkflow:
             image = Image.open(io.BytesIO(image_data))
             prompt = "Extract all text content from this image. Provide clean, formatted text without interpretation."
             
-            response = self.gemini_vision_model.generate_content([prompt, image])
+            response = await asyncio.to_thread(self.gemini_vision_model.generate_content, [prompt, image])
             return response.text, 0.8
         except Exception as e:
             logger.error(f"Gemini Vision extraction failed: {e}")
@@ -591,51 +627,10 @@ class StudyHelperWorkflow:
     async def _extract_basic_text(self, image_data: bytes) -> str:
         """Basic text extraction using EasyOCR or fallback methods"""
         try:
-            # Try EasyOCR first
-            try:
-                import easyocr
-                
-                # Initialize reader for English (can be extended for other languages)
-                reader = easyocr.Reader(['en'])
-                
-                # Convert bytes to numpy array
-                import numpy as np
-                from PIL import Image
-                import io
-                
-                image = Image.open(io.BytesIO(image_data))
-                image_array = np.array(image)
-                
-                # Extract text
-                results = reader.readtext(image_array)
-                
-                # Combine all detected text
-                extracted_text = " ".join([result[1] for result in results if result[2] > 0.5])  # Confidence > 0.5
-                
-                if extracted_text.strip():
-                    return extracted_text.strip()
-                    
-            except ImportError:
-                logger.warning("EasyOCR not available, falling back to basic extraction")
-            except Exception as e:
-                logger.warning(f"EasyOCR failed: {e}, falling back to basic extraction")
-            
-            # Fallback: Use Tesseract if available
-            try:
-                import pytesseract
-                from PIL import Image
-                import io
-                
-                image = Image.open(io.BytesIO(image_data))
-                text = pytesseract.image_to_string(image)
-                
-                if text.strip():
-                    return text.strip()
-                    
-            except ImportError:
-                logger.warning("Tesseract not available")
-            except Exception as e:
-                logger.warning(f"Tesseract failed: {e}")
+            # Local OCR is CPU-bound, so it runs off the event loop
+            text = await asyncio.to_thread(self._extract_local_ocr_text, image_data)
+            if text:
+                return text
             
             # Last resort: Use Google Vision if available
             if self.vision_client:
@@ -653,6 +648,56 @@ class StudyHelperWorkflow:
             logger.error(f"All text extraction methods failed: {e}")
             return "Text extraction failed due to processing error"
     
+    def _extract_local_ocr_text(self, image_data: bytes) -> str:
+        """Extract text with EasyOCR, falling back to Tesseract; empty if neither works"""
+        # Try EasyOCR first
+        try:
+            import easyocr
+            
+            # Initialize reader for English (can be extended for other languages)
+            reader = easyocr.Reader(['en'])
+            
+            # Convert bytes to numpy array
+            import numpy as np
+            from PIL import Image
+            import io
+            
+            image = Image.open(io.BytesIO(image_data))
+            image_array = np.array(image)
+            
+            # Extract text
+            results = reader.readtext(image_array)
+            
+            # Combine all detected text
+            extracted_text = " ".join([result[1] for result in results if result[2] > 0.5])  # Confidence > 0.5
+            
+            if extracted_text.strip():
+                return extracted_text.strip()
+                
+        except ImportError:
+            logger.warning("EasyOCR not available, falling back to basic extraction")
+        except Exception as e:
+            logger.warning(f"EasyOCR failed: {e}, falling back to basic extraction")
+        
+        # Fallback: Use Tesseract if available
+        try:
+            import pytesseract
+            from PIL import Image
+            import io
+            
+            image = Image.open(io.BytesIO(image_data))
+            text = pytesseract.image_to_string(image)
+            
+            if text.strip():
+                return text.strip()
+                
+        except ImportError:
+            logger.warning("Tesseract not available")
+        except Exception as e:
+            logger.warning(f"Tesseract failed: {e}")
+        
+        return ""
+    
     def _parse_quality_response(self, response: str) -> Dict[str, Any]:
         """Parse quality assessment response"""
         try:
@@ -855,6 +900,30 @@ class StudyHelperWorkflow:
             )
             return error_state
 
+    async def run_workflow(self, state: ImageProcessingState) -> ImageProcessingState:
+        """Run the workflow up to text extraction, leaving AI generation to the caller"""
+        try:
+            state = await self.validate_image_node(state)
+            if not state.should_proceed:
+                return state
+            state = await self.assess_quality_node(state)
+            state = await self.classify_content_node(state)
+            state = await self.route_processing_node(state)
+
+            next_step = self.should_continue_processing(state)
+            if next_step == "end":
+                return state
+            if next_step == "preprocess":
+                state = await self.preprocess_image_node(state)
+
+            return await self.extract_text_node(state)
+
+        except Exception as e:
+            logger.error(f"Workflow execution failed: {e}")
+            state.error_message = f"Workflow failed: {str(e)}"
+            state.should_proceed = False
+            return state
+
 
 # Global workflow instance
 workflow_instance = None
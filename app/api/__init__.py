@@ -3,9 +3,10 @@ API Package
 FastAPI routers and endpoints
 """
 
-from app.api import health, realtime
-
+# Routers are imported on demand by app.main.create_application
 __all__ = [
     "health",
     "realtime",
+    "auth",
+    "study_helper",
 ]
\ No newline at end of file
@@ -28,11 +28,12 @@ from app.schemas.auth import (
     MessageResponse,
     ErrorResponse
 )
+from app.schemas.auth_fast import UserLoginRequest, LOGIN_REQUEST_OPENAPI, decode_login_request
 from app.services.auth import AuthService
 from app.core.config import settings
 
 from app.core.database import get_db
-from app.core.auth import create_cookie_response_data
+from app.core.auth import create_cookie_response_data, hash_refresh_token
 from app.core.dependencies import (
     CurrentUser, 
     CurrentActiveUser, 
@@ -42,7 +43,6 @@ from app.core.dependencies import (
 )
 from app.schemas import (
     UserRegisterRequest,
-    UserLoginRequest,
     GoogleOAuthRequest,
     GoogleOAuthCompleteRequest,
     TokenResponse,
@@ -88,19 +88,19 @@ async def register_user(
     # return this information in the response or check logs
     logger.info(f"User {user.email} registered successfully. Verification email sent.")
 
-    return UserResponse.model_validate(user)
+    return UserResponse.from_trusted(user)
 
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, openapi_extra=LOGIN_REQUEST_OPENAPI)
 async def login_user(
-    user_data: UserLoginRequest,
     request: Request,
     response: Response,
-    auth_service: AuthServiceDep
+    auth_service: AuthServiceDep,
+    user_data: UserLoginRequest = Depends(decode_login_request)
 ):
     """Authenticate user and create session"""
     
-    user, access_token, refresh_token, session = auth_service.login_user(
+    user, access_token, refresh_token, session = await auth_service.login_user(
         email=user_data.email,
         password=user_data.password,
         request=request
@@ -138,7 +138,7 @@ async def login_user(
     return TokenResponse(
         access_token=access_token,
         expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        user=UserResponse.model_validate(user)
+        user=UserResponse.from_trusted(user)
     )
 
 
@@ -146,14 +146,7 @@ async def login_user(
 async def google_authorize(state: Optional[str] = None):
     """Get Google OAuth authorization URL"""
 
-    # Create a fresh instance to ensure settings are loaded correctly
-    from app.services.google_oauth import GoogleOAuthService
-    from app.core.config import settings
-
     logger.info(f"Google authorize endpoint called")
-    logger.info(f"Settings GOOGLE_CLIENT_ID: {bool(settings.GOOGLE_CLIENT_ID)}")
-
-    google_oauth_service = GoogleOAuthService()
     logger.info(f"Service client_id: {bool(google_oauth_service.client_id)}")
 
     auth_url = google_oauth_service.get_authorization_url(state=state)
@@ -171,10 +164,6 @@ async def google_callback(
     """Handle Google OAuth callback"""
 
     try:
-        # Create a fresh instance to ensure settings are loaded correctly
-        from app.services.google_oauth import GoogleOAuthService
-        google_oauth_service = GoogleOAuthService()
-
         # Complete OAuth flow and get user data
         user_data = await google_oauth_service.complete_oauth_flow(code)
 
@@ -266,7 +255,6 @@ async def google_callback(
                     existing_user.last_name = user_data.get("last_name", existing_user.last_name)
                 
                 auth_service.db.commit()
-                auth_service.db.refresh(existing_user)
                 
                 # Log them in directly (they already have complete profile from email registration)
                 user, access_token, refresh_token, session = await auth_service._google_login_existing_user(
@@ -393,7 +381,6 @@ async def complete_google_registration(
                 existing_user.last_name = registration_data.last_name
 
             auth_service.db.commit()
-            auth_service.db.refresh(existing_user)
             logger.info(f"User updated. New Google ID: {existing_user.google_id}")
 
             # Log the user in
@@ -454,7 +441,7 @@ async def complete_google_registration(
         return TokenResponse(
             access_token=access_token,
             expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-            user=UserResponse.model_validate(user)
+            user=UserResponse.from_trusted(user)
         )
 
     except HTTPException:
@@ -476,7 +463,7 @@ async def refresh_tokens(
 ):
     """Refresh access token using refresh token"""
     
-    new_access_token, new_refresh_token, session = auth_service.refresh_tokens(
+    new_access_token, new_refresh_token, _, user = auth_service.refresh_tokens(
         refresh_token=refresh_token,
         request=request
     )
@@ -509,12 +496,10 @@ async def refresh_tokens(
         domain=cookie_data["refresh_token"]["domain"]
     )
     
-    user = auth_service.get_user_by_id(session.user_id)
-    
     return TokenResponse(
         access_token=new_access_token,
         expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        user=UserResponse.model_validate(user)
+        user=UserResponse.from_trusted(user)
     )
 
 
@@ -579,7 +564,7 @@ async def resend_verification_email(
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: CurrentUser):
     """Get current user information"""
-    return UserResponse.model_validate(current_user)
+    return UserResponse.from_trusted(current_user)
 
 
 @router.put("/me", response_model=UserResponse)
@@ -606,9 +591,8 @@ async def update_user_profile(
     
     current_user.updated_at = datetime.now(timezone.utc)
     db.commit()
-    db.refresh(current_user)
     
-    return UserResponse.model_validate(current_user)
+    return UserResponse.from_trusted(current_user)
 
 
 @router.get("/sessions", response_model=SessionListResponse)
@@ -623,15 +607,16 @@ async def get_user_sessions(
     
     # Find current session
     current_session = None
+    refresh_token_hash = hash_refresh_token(refresh_token)
     for session in sessions:
-        if session.refresh_token == refresh_token:
+        if session.refresh_token_hash == refresh_token_hash:
             current_session = session
             break
     
     current_session_id = current_session.id if current_session else None
     
     return SessionListResponse(
-        sessions=[UserSessionResponse.model_validate(session) for session in sessions],
+        sessions=[UserSessionResponse.from_trusted(session) for session in sessions],
         current_session_id=current_session_id
     )
 
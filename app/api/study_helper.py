@@ -2,13 +2,17 @@
 Study Helper API Routes
 FastAPI routes for AI-powered study assistance
 """
+import hashlib
+import json
 import logging
-from typing import Optional
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
+from pathlib import Path
+from typing import Any, Optional, Tuple
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from app.core.dependencies import get_db, get_current_user
+from app.core.dependencies import get_current_user, get_current_user_with_db
 from app.models.user import User
 from app.services.study_helper import get_study_helper_service
 from app.agent.schemas import StudySessionResponse
@@ -18,10 +22,75 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/study", tags=["Study Helper"])
 
+_ALLOWED_EXTENSIONS = frozenset(ext.lower() for ext in settings.ALLOWED_FILE_TYPES)
+
+# Static frontend configuration, served with a precomputed ETag
+_STUDY_HELPER_CONFIG = {
+    "max_file_size_mb": settings.MAX_FILE_SIZE / (1024 * 1024),
+    "allowed_file_types": settings.ALLOWED_FILE_TYPES,
+    "supported_image_formats": settings.SUPPORTED_IMAGE_FORMATS,
+    "default_quiz_questions": settings.DEFAULT_QUIZ_QUESTIONS,
+    "max_quiz_questions": settings.MAX_QUIZ_QUESTIONS,
+    "quality_threshold": settings.QUALITY_THRESHOLD,
+    "min_text_length": settings.MIN_TEXT_LENGTH,
+    "features": {
+        "summary_generation": True,
+        "explanation_generation": True,
+        "quiz_generation": True,
+        "quality_assessment": True,
+        "content_classification": True,
+        "image_preprocessing": True
+    }
+}
+
+
+def _compute_etag(content: Any) -> str:
+    """Build a strong ETag from the JSON form of a response body"""
+    body = json.dumps(jsonable_encoder(content), sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:16] + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check the If-None-Match header against an ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+_STUDY_HELPER_CONFIG_ETAG = _compute_etag(_STUDY_HELPER_CONFIG)
+_CONFIG_CACHE_CONTROL = "private, max-age=3600"
+_SESSIONS_CACHE_CONTROL = "private, no-cache"
+
+
+def validate_upload(
+    file: UploadFile = File(..., description="Image file to process")
+) -> UploadFile:
+    """
+    Reject unsupported or oversized uploads before any other dependency runs
+    
+    Declared ahead of the database and auth dependencies so rejected
+    requests never check out a session.
+    """
+    ext = Path(file.filename or "").suffix.lower()
+    if ext not in _ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported media type"
+        )
+    
+    if file.size and file.size > settings.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large"
+        )
+    
+    return file
+
 
 @router.post("/upload-enhanced", response_model=StudySessionResponse)
 async def upload_enhanced_study_image(
-    file: UploadFile = File(..., description="Image file to process"),
+    file: UploadFile = Depends(validate_upload),
     generate_summary: bool = Form(True, description="Generate summary"),
     generate_explanation: bool = Form(True, description="Generate explanation"),
     generate_quiz: bool = Form(True, description="Generate quiz questions"),
@@ -33,8 +102,7 @@ async def upload_enhanced_study_image(
     max_concurrency: int = Form(3, ge=1, le=5, description="Maximum concurrent chunk processing"),
     preserve_equations: bool = Form(True, description="Preserve mathematical content"),
     preprocessing: bool = Form(True, description="Enable text preprocessing"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    auth_context: Tuple[User, Session] = Depends(get_current_user_with_db)
 ):
     """
     Enhanced upload endpoint with chunked processing support
@@ -46,6 +114,7 @@ async def upload_enhanced_study_image(
     - Enhanced text preprocessing
     """
     try:
+        current_user, db = auth_context
         study_service = get_study_helper_service(db)
         
         result = await study_service.process_enhanced_study_image(
@@ -81,8 +150,7 @@ async def estimate_processing_requirements(
     file: UploadFile = File(..., description="Image file to analyze"),
     chunk_size: int = Form(4000, ge=1000, le=8000, description="Proposed chunk size"),
     max_concurrency: int = Form(3, ge=1, le=5, description="Proposed concurrency"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    auth_context: Tuple[User, Session] = Depends(get_current_user_with_db)
 ):
     """
     Estimate processing requirements for a document
@@ -94,6 +162,7 @@ async def estimate_processing_requirements(
     - Recommendations for optimal settings
     """
     try:
+        _, db = auth_context
         study_service = get_study_helper_service(db)
         
         estimate = await study_service.estimate_processing_requirements(
@@ -116,15 +185,14 @@ async def estimate_processing_requirements(
 
 @router.post("/upload", response_model=StudySessionResponse)
 async def upload_study_image(
-    file: UploadFile = File(..., description="Image file to process"),
+    file: UploadFile = Depends(validate_upload),
     generate_summary: bool = Form(True, description="Generate summary"),
     generate_explanation: bool = Form(True, description="Generate explanation"),
     generate_quiz: bool = Form(True, description="Generate quiz questions"),
     quiz_question_count: int = Form(5, ge=1, le=20, description="Number of quiz questions"),
     quiz_difficulty: Optional[str] = Form(None, description="Quiz difficulty (easy/medium/hard)"),
     explanation_level: Optional[str] = Form(None, description="Explanation level (beginner/intermediate/advanced)"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    auth_context: Tuple[User, Session] = Depends(get_current_user_with_db)
 ):
     """
     Upload and process an educational image
@@ -150,6 +218,7 @@ async def upload_study_image(
     - Extract content from diagrams with explanations
     """
     try:
+        current_user, db = auth_context
         study_service = get_study_helper_service(db)
         
         result = await study_service.process_study_image(
@@ -178,8 +247,7 @@ async def upload_study_image(
 @router.get("/session/{session_id}", response_model=StudySessionResponse)
 async def get_study_session(
     session_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    auth_context: Tuple[User, Session] = Depends(get_current_user_with_db)
 ):
     """
     Get a specific study session by ID
@@ -187,6 +255,7 @@ async def get_study_session(
     Retrieve the results of a previously processed study session.
     """
     try:
+        current_user, db = auth_context
         study_service = get_study_helper_service(db)
         session = await study_service.get_study_session(session_id, current_user)
         
@@ -210,25 +279,36 @@ async def get_study_session(
 
 @router.get("/sessions")
 async def list_study_sessions(
+    request: Request,
+    response: Response,
     limit: int = 20,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    auth_context: Tuple[User, Session] = Depends(get_current_user_with_db)
 ):
     """
     List user's study sessions
     
     Get a list of the user's recent study sessions with basic information.
+    Responds with 304 Not Modified when the client's ETag is still current.
     """
     try:
+        current_user, db = auth_context
         study_service = get_study_helper_service(db)
         sessions = await study_service.list_user_sessions(current_user, limit)
         
-        return {
+        payload = {
             "sessions": sessions,
             "total": len(sessions),
             "limit": limit
         }
         
+        etag = _compute_etag(payload)
+        headers = {"ETag": etag, "Cache-Control": _SESSIONS_CACHE_CONTROL}
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        response.headers.update(headers)
+        return payload
+        
     except Exception as e:
         logger.error(f"Failed to list study sessions: {e}")
         raise HTTPException(
@@ -240,8 +320,7 @@ async def list_study_sessions(
 @router.delete("/session/{session_id}")
 async def delete_study_session(
     session_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    auth_context: Tuple[User, Session] = Depends(get_current_user_with_db)
 ):
     """
     Delete a study session
@@ -249,6 +328,7 @@ async def delete_study_session(
     Remove a study session and its associated files.
     """
     try:
+        current_user, db = auth_context
         study_service = get_study_helper_service(db)
         deleted = await study_service.delete_study_session(session_id, current_user)
         
@@ -328,30 +408,22 @@ async def study_helper_health():
 
 @router.get("/config")
 async def get_study_helper_config(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get study helper configuration
     
     Return configuration settings for the frontend.
+    Responds with 304 Not Modified when the client's ETag is still current.
     """
-    return {
-        "max_file_size_mb": settings.MAX_FILE_SIZE / (1024 * 1024),
-        "allowed_file_types": settings.ALLOWED_FILE_TYPES,
-        "supported_image_formats": settings.SUPPORTED_IMAGE_FORMATS,
-        "default_quiz_questions": settings.DEFAULT_QUIZ_QUESTIONS,
-        "max_quiz_questions": settings.MAX_QUIZ_QUESTIONS,
-        "quality_threshold": settings.QUALITY_THRESHOLD,
-        "min_text_length": settings.MIN_TEXT_LENGTH,
-        "features": {
-            "summary_generation": True,
-            "explanation_generation": True,
-            "quiz_generation": True,
-            "quality_assessment": True,
-            "content_classification": True,
-            "image_preprocessing": True
-        }
-    }
+    headers = {"ETag": _STUDY_HELPER_CONFIG_ETAG, "Cache-Control": _CONFIG_CACHE_CONTROL}
+    if _etag_matches(request, _STUDY_HELPER_CONFIG_ETAG):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return _STUDY_HELPER_CONFIG
 
 
 @router.post("/test")
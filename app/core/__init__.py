@@ -4,7 +4,7 @@ Application core components: configuration, database, events
 """
 
 from app.core.config import settings, Settings
-from app.core.database import engine, SessionLocal, Base, get_db
+from app.core.database import engine, SessionLocal, Base, get_db, db_session
 from app.core.events import startup_handler, shutdown_handler
 
 __all__ = [
@@ -14,6 +14,7 @@ __all__ = [
     "SessionLocal", 
     "Base",
     "get_db",
+    "db_session",
     "startup_handler",
     "shutdown_handler",
 ]
\ No newline at end of file
@@ -3,11 +3,17 @@ Authentication Utilities
 JWT token handling, password hashing, and security utilities
 """
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
-import uuid
+from typing import Optional, Dict, Any, Tuple
+import base64
+from functools import lru_cache
+import hashlib
+import os
 import secrets
+import threading
+import time
+from cachetools import TTLCache
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+from jose import ExpiredSignatureError, JWTError, jwt
 from fastapi import HTTPException, status
 from app.core.config import settings
 
@@ -15,6 +21,71 @@ from app.core.config import settings
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+class _RandPool:
+    """Per-process buffer of OS randomness, sliced to mint token IDs"""
+    
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self.reset()
+    
+    def reset(self) -> None:
+        """Refill from the OS; forked children call this so they never share a buffer"""
+        self.buf = os.urandom(self.size)
+        self.pos = 0
+        self.lock = threading.Lock()
+    
+    def take(self, n: int = 16) -> bytes:
+        """Return the next n unused random bytes, refilling when exhausted"""
+        with self.lock:
+            if self.pos + n > self.size:
+                self.buf = os.urandom(self.size)
+                self.pos = 0
+            chunk = self.buf[self.pos:self.pos + n]
+            self.pos += n
+            return chunk
+
+
+_rand_pool = _RandPool()
+
+# A child inheriting the parent's buffer and position would mint the same JTIs
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_rand_pool.reset)
+
+
+def _new_jti() -> str:
+    """Generate a unique JWT ID from the shared randomness pool"""
+    return base64.urlsafe_b64encode(_rand_pool.take(16)).rstrip(b"=").decode()
+
+
+# Decode parameters, resolved once; jose enforces exp and the required claims
+_JWT_KEY = settings.SECRET_KEY
+_JWT_ALGORITHMS = [settings.ALGORITHM]
+_JWT_DECODE_OPTIONS = {"require_exp": True, "require_iat": True, "require_sub": True}
+_ACCESS_TTL = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+_REFRESH_TTL = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+# Pre-built auth failure responses (reused on every rejected token)
+_BEARER_HEADERS = {"WWW-Authenticate": "Bearer"}
+_INVALID_CRED_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers=_BEARER_HEADERS,
+)
+_EXPIRED_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Token expired",
+    headers=_BEARER_HEADERS,
+)
+_INVALID_TYPE_EXC = {
+    token_type: HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=f"Invalid token type. Expected {token_type}",
+        headers=_BEARER_HEADERS,
+    )
+    for token_type in ("access", "refresh")
+}
+
+
 def hash_password(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
@@ -25,103 +96,134 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+@lru_cache(maxsize=1)
+def _dummy_password_hash() -> str:
+    """Hash compared against when there is no real one, built on first use"""
+    return pwd_context.hash(secrets.token_urlsafe(16))
+
+
+def verify_password_constant_time(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """Verify a password, paying the full hash cost even when there is no hash"""
+    if not hashed_password:
+        pwd_context.verify(plain_password, _dummy_password_hash())
+        return False
+    return pwd_context.verify(plain_password, hashed_password)
+
+
 def generate_random_token(length: int = 32) -> str:
     """Generate a secure random token"""
     return secrets.token_urlsafe(length)
 
 
+def _encode_token(
+    claims: Dict[str, Any],
+    token_type: str,
+    now: datetime,
+    lifetime: timedelta
+) -> Tuple[str, str]:
+    """Sign claims plus the standard exp/jti/type fields, returning (token, jti)"""
+    jti = _new_jti()  # JWT ID for tracking
+    token = jwt.encode(
+        {**claims, "exp": now + lifetime, "jti": jti, "type": token_type},
+        _JWT_KEY,
+        algorithm=settings.ALGORITHM
+    )
+    return token, jti
+
+
 def create_access_token(
     data: Dict[str, Any],
     expires_delta: Optional[timedelta] = None
-) -> str:
-    """Create JWT access token"""
-    to_encode = data.copy()
-    
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    # Add standard JWT claims
-    to_encode.update({
-        "exp": expire,
-        "iat": datetime.now(timezone.utc),
-        "jti": str(uuid.uuid4()),  # JWT ID for tracking
-        "type": "access"
-    })
-    
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+) -> Tuple[str, str]:
+    """Create JWT access token, returning (token, jti)"""
+    now = datetime.now(timezone.utc)
+    return _encode_token({**data, "iat": now}, "access", now, expires_delta or _ACCESS_TTL)
 
 
 def create_refresh_token(
     data: Dict[str, Any],
     expires_delta: Optional[timedelta] = None
-) -> str:
-    """Create JWT refresh token"""
-    to_encode = data.copy()
-    
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+) -> Tuple[str, str]:
+    """Create JWT refresh token, returning (token, jti)"""
+    now = datetime.now(timezone.utc)
+    return _encode_token({**data, "iat": now}, "refresh", now, expires_delta or _REFRESH_TTL)
+
+
+def create_token_pair(user: Any) -> Tuple[str, str, str]:
+    """Create an access and refresh token for a user from one set of base claims
     
-    # Add standard JWT claims
-    to_encode.update({
-        "exp": expire,
-        "iat": datetime.now(timezone.utc),
-        "jti": str(uuid.uuid4()),  # JWT ID for tracking
-        "type": "refresh"
-    })
+    Returns:
+        Tuple of (access_token, refresh_token, access_token_jti)
+    """
+    now = datetime.now(timezone.utc)
+    base = {"sub": str(user.id), "email": user.email, "iat": now}
     
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    access_token, access_jti = _encode_token(base, "access", now, _ACCESS_TTL)
+    refresh_token, _ = _encode_token(base, "refresh", now, _REFRESH_TTL)
+    return access_token, refresh_token, access_jti
 
 
 def verify_token(token: str, token_type: str = "access") -> Dict[str, Any]:
     """Verify and decode JWT token"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        
-        # Check token type
-        if payload.get("type") != token_type:
+        payload = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS, options=_JWT_DECODE_OPTIONS)
+    except ExpiredSignatureError:
+        raise _EXPIRED_EXC.with_traceback(None)
+    except JWTError:
+        raise _INVALID_CRED_EXC.with_traceback(None)
+    
+    # Check token type
+    if payload.get("type") != token_type:
+        exc = _INVALID_TYPE_EXC.get(token_type)
+        if exc is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=f"Invalid token type. Expected {token_type}",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # Check expiration
-        exp = payload.get("exp")
-        if exp is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token missing expiration",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        if datetime.fromtimestamp(exp, tz=timezone.utc) < datetime.now(timezone.utc):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token expired",
-                headers={"WWW-Authenticate": "Bearer"},
+                headers=_BEARER_HEADERS,
             )
-        
-        return payload
-        
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise exc.with_traceback(None)
+    
+    return payload
+
+
+# Verified access-token payloads keyed by a digest of the raw token
+_TOKEN_CACHE_TTL_SECONDS = 30
+_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=_TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+
+def verify_access_token_cached(token: str) -> Dict[str, Any]:
+    """Verify an access token, reusing recent verifications of the same token"""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    now = time.time()
+    
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached is not None:
+        payload, valid_until = cached
+        if now < valid_until:
+            return payload
+    
+    payload = verify_token(token, token_type="access")
+    
+    # Never serve a cached payload past the token's own expiry
+    valid_until = min(now + _TOKEN_CACHE_TTL_SECONDS, payload["exp"])
+    with _token_cache_lock:
+        _token_cache[key] = (payload, valid_until)
+    
+    return payload
+
+
+def hash_refresh_token(token: str) -> bytes:
+    """SHA-256 digest of a refresh token, as stored on the session row"""
+    return hashlib.sha256(token.encode()).digest()
 
 
 def extract_token_jti(token: str) -> str:
     """Extract JWT ID from token without verification"""
     try:
-        # Decode without verification to get JTI
-        payload = jwt.decode(token, options={"verify_signature": False})
+        # Read the claims without verification to get JTI
+        payload = jwt.get_unverified_claims(token)
         return payload.get("jti", "")
     except Exception:
         return ""
@@ -2,9 +2,10 @@
 Application Configuration
 Environment-based settings using Pydantic Settings
 """
+from functools import cached_property
 from typing import List, Optional
 from pydantic_settings import BaseSettings
-from pydantic import model_validator, ConfigDict
+from pydantic import computed_field, ConfigDict
 import os
 
 
@@ -24,10 +25,13 @@ class Settings(BaseSettings):
     VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
     DEBUG: bool = False
+    AUTO_CREATE_TABLES: bool = False  # Dev only; Alembic owns the schema otherwise
     
     # Server
     HOST: str = "127.0.0.1"
     PORT: int = 8000
+    WORKERS: int = 1  # Worker processes when not reloading
+    ENABLED_ROUTERS: List[str] = ["health", "auth", "realtime", "study_helper"]
     
     # CORS
     ALLOWED_HOSTS: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
@@ -40,24 +44,13 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = ""
     DB_NAME: str = "educapture_db"
     
-    @model_validator(mode='before')
-    @classmethod
-    def assemble_db_connection(cls, values):
-        # If DATABASE_URL is already provided, use it
-        if isinstance(values, dict) and values.get('DATABASE_URL'):
-            return values
-            
-        if isinstance(values, dict):
-            # Construct database URL from individual components
-            user = values.get('DB_USER', 'postgres')
-            password = values.get('DB_PASSWORD', '')
-            host = values.get('DB_HOST', 'localhost')
-            port = values.get('DB_PORT', 5432)
-            db_name = values.get('DB_NAME', 'educapture_db')
-            
-            values['DATABASE_URL'] = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
-        
-        return values
+    @computed_field
+    @cached_property
+    def database_url(self) -> str:
+        """Database URL, assembled from the DB_* components unless DATABASE_URL is set"""
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
+        return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
     # S3 Configuration
     AWS_ACCESS_KEY_ID: Optional[str] = None
@@ -92,6 +85,8 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
+    MAIL_RATE_LIMIT: float = 10.0  # Outbound emails per second
+    MAIL_RECIPIENT_RATE_LIMIT: float = 5.0  # Emails per recipient per minute
     
     # Frontend URL
     FRONTEND_URL: str = "http://localhost:3000"
@@ -4,35 +4,72 @@ SQLAlchemy engine, session, and base model setup
 """
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
+from typing import Optional, Tuple
+import contextvars
+import itertools
+import threading
 
 from app.core.config import settings
 
 # Create SQLAlchemy engine
 engine = create_engine(
-    settings.DATABASE_URL,
+    settings.database_url,
     pool_pre_ping=True,
     pool_recycle=300,
     echo=settings.DEBUG
 )
 
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Create Base class for models
 Base = declarative_base()
 
+# Identifier of the HTTP request currently being served, set by DBSessionMiddleware
+_request_scope: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("db_request_scope", default=None)
+_request_ids = itertools.count()
 
-def get_db() -> Generator[Session, None, None]:
+
+def _session_scope() -> Tuple[str, int]:
+    """Scope sessions per request, falling back to per-thread outside requests"""
+    request_id = _request_scope.get()
+    if request_id is not None:
+        return ("request", request_id)
+    return ("thread", threading.get_ident())
+
+
+# Request-scoped session registry
+db_session = scoped_session(SessionLocal, scopefunc=_session_scope)
+
+
+class DBSessionMiddleware:
+    """ASGI middleware that gives each request one session and releases it afterwards"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        token = _request_scope.set(next(_request_ids))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            db_session.remove()
+            _request_scope.reset(token)
+
+
+def get_db() -> Session:
     """
-    Dependency to get database session
+    Dependency to get the request-scoped database session
+    
+    The session is closed by DBSessionMiddleware when the request ends;
+    callers outside a request must call db_session.remove() themselves.
     """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    return db_session()
 
 
 def create_tables():
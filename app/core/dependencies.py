@@ -2,25 +2,126 @@
 Authentication Dependencies
 FastAPI dependencies for authentication and authorization
 """
-from typing import Optional, Annotated
+from typing import Optional, Annotated, Tuple
 from fastapi import Depends, HTTPException, status, Request, Cookie
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPBearer
+from cachetools import TTLCache
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, joinedload, load_only, make_transient_to_detached
+import re
+import threading
 import uuid
 
 from app.core.database import get_db
-from app.core.auth import verify_token
+from app.core.auth import hash_refresh_token, verify_access_token_cached
 from app.models import User, UserSession
 from app.services.auth import AuthService
 
+class _OpenAPIBearer(HTTPBearer):
+    """Bearer scheme that only registers itself in the OpenAPI schema"""
+    
+    async def __call__(self, request: Request) -> None:
+        # The header is parsed in get_token_from_cookie_or_header, and only
+        # when no cookie is present
+        return None
+
+
 # Security scheme for OpenAPI documentation
-security = HTTPBearer(auto_error=False)
+security = _OpenAPIBearer(scheme_name="HTTPBearer", auto_error=False)
+
+# Pre-built auth errors; raised with a cleared traceback so frames never accumulate
+_BEARER_HEADERS = {"WWW-Authenticate": "Bearer"}
+_AUTH_REQUIRED = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Authentication required",
+    headers=_BEARER_HEADERS,
+)
+_INVALID_PAYLOAD = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid token payload",
+    headers=_BEARER_HEADERS,
+)
+_INVALID_UUID = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid user ID format",
+    headers=_BEARER_HEADERS,
+)
+_USER_NOT_FOUND = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="User not found or account is not active",
+    headers=_BEARER_HEADERS,
+)
+_INACTIVE = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Inactive user"
+)
+_UNVERIFIED = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Email not verified"
+)
+_REFRESH_REQUIRED = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Refresh token required"
+)
+_INVALID_SESSION = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid session"
+)
+
+# Canonical hyphenated UUID, as issued in the "sub" claim
+_UUID_RE = re.compile(r"\A[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\Z")
+
+# Auth fields of recently authenticated users, keyed by user ID. Profile
+# columns are never cached; they load fresh on first access. Each worker
+# process holds its own cache, so writes made through another worker show
+# up here within the TTL
+_user_cache: TTLCache = TTLCache(maxsize=5000, ttl=30)
+_user_cache_lock = threading.Lock()
+_AUTH_COLUMNS = (User.id, User.status, User.is_active, User.is_email_verified)
+_AUTH_KEYS = tuple(column.key for column in _AUTH_COLUMNS)
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    """Drop a user from the authentication cache"""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    """Keep the authentication cache in step with ORM writes to users; Core
+    UPDATE/DELETE statements skip these events and call invalidate_user"""
+    invalidate_user(target.id)
+
+
+def _load_user(db: Session, user_uuid: uuid.UUID) -> Optional[User]:
+    """Load a login-eligible user with only its auth fields; the rest load on access"""
+    with _user_cache_lock:
+        snapshot = _user_cache.get(user_uuid)
+    
+    if snapshot is not None:
+        # Rebuild as a detached instance and attach it without a SELECT;
+        # every column missing from the snapshot is expired
+        user = User(**dict(zip(_AUTH_KEYS, snapshot)))
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+    
+    # Eligibility is checked in SQL, so ineligible users come back as None
+    user = db.query(User).options(load_only(*_AUTH_COLUMNS)).filter(
+        User.id == user_uuid, User.can_login
+    ).first()
+    if user is not None:
+        with _user_cache_lock:
+            _user_cache[user_uuid] = tuple(getattr(user, key) for key in _AUTH_KEYS)
+    
+    return user
 
 
 def get_token_from_cookie_or_header(
     request: Request,
-    authorization: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    access_token: Optional[str] = Cookie(None)
+    access_token: Optional[str] = Cookie(None),
+    _: None = Depends(security)
 ) -> Optional[str]:
     """Extract token from cookie or Authorization header"""
     
@@ -29,65 +130,66 @@ def get_token_from_cookie_or_header(
         return access_token
     
     # Fall back to Authorization header
-    if authorization:
-        return authorization.credentials
+    authorization = request.headers.get("authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:] or None
     
     return None
 
 
-def get_current_user(
-    token: Optional[str] = Depends(get_token_from_cookie_or_header),
-    db: Session = Depends(get_db)
+def _resolve_user(
+    token: Optional[str],
+    db: Session,
+    *,
+    require_active: bool = False,
+    require_verified: bool = False
 ) -> User:
-    """Get current authenticated user"""
+    """Authenticate the token and run every requested account check inline"""
     
     if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authentication required",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _AUTH_REQUIRED.with_traceback(None)
     
     # Verify token
-    payload = verify_token(token, token_type="access")
+    payload = verify_access_token_cached(token)
     user_id = payload.get("sub")
     
     if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _INVALID_PAYLOAD.with_traceback(None)
     
     # Get user from database
-    try:
-        user_uuid = uuid.UUID(user_id)
-    except ValueError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid user ID format",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = db.query(User).filter(User.id == user_uuid).first()
+    if not _UUID_RE.match(user_id):
+        raise _INVALID_UUID.with_traceback(None)
+    user_uuid = uuid.UUID(user_id)
+    
+    user = _load_user(db, user_uuid)
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Check if user can still login (account status, etc.)
-    if not user.can_login:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Account is not active",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _USER_NOT_FOUND.with_traceback(None)
+    
+    if require_active and not user.is_active:
+        raise _INACTIVE.with_traceback(None)
+    
+    if require_verified and not user.is_email_verified:
+        raise _UNVERIFIED.with_traceback(None)
     
     return user
 
 
+def get_current_user(
+    token: Optional[str] = Depends(get_token_from_cookie_or_header),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current authenticated user"""
+    return _resolve_user(token, db)
+
+
+def get_current_user_with_db(
+    token: Optional[str] = Depends(get_token_from_cookie_or_header),
+    db: Session = Depends(get_db)
+) -> Tuple[User, Session]:
+    """Get current authenticated user together with the session used to load it"""
+    return get_current_user(token, db), db
+
+
 def get_optional_current_user(
     token: Optional[str] = Depends(get_token_from_cookie_or_header),
     db: Session = Depends(get_db)
@@ -104,31 +206,19 @@ def get_optional_current_user(
 
 
 def get_current_active_user(
-    current_user: User = Depends(get_current_user)
+    token: Optional[str] = Depends(get_token_from_cookie_or_header),
+    db: Session = Depends(get_db)
 ) -> User:
     """Get current active user (additional check for active status)"""
-    
-    if not current_user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Inactive user"
-        )
-    
-    return current_user
+    return _resolve_user(token, db, require_active=True)
 
 
 def get_verified_user(
-    current_user: User = Depends(get_current_active_user)
+    token: Optional[str] = Depends(get_token_from_cookie_or_header),
+    db: Session = Depends(get_db)
 ) -> User:
     """Get current verified user"""
-    
-    if not current_user.is_email_verified:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email not verified"
-        )
-    
-    return current_user
+    return _resolve_user(token, db, require_active=True, require_verified=True)
 
 
 def get_refresh_token_from_cookie(
@@ -137,10 +227,7 @@ def get_refresh_token_from_cookie(
     """Get refresh token from cookie"""
     
     if not refresh_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Refresh token required"
-        )
+        raise _REFRESH_REQUIRED.with_traceback(None)
     
     return refresh_token
 
@@ -152,16 +239,18 @@ def get_current_session(
 ) -> UserSession:
     """Get current user session"""
     
-    # Find session by refresh token
-    session = db.query(UserSession).filter(
-        UserSession.refresh_token == refresh_token
+    # Find a valid session by refresh token, loading its user in the same query
+    session = db.query(UserSession).options(
+        joinedload(UserSession.user)
+    ).filter(
+        UserSession.refresh_token_hash == hash_refresh_token(refresh_token),
+        UserSession.is_active.is_(True),
+        UserSession.is_revoked.is_(False),
+        UserSession.expires_at > func.now()
     ).first()
     
-    if not session or not session.is_valid:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid session"
-        )
+    if not session:
+        raise _INVALID_SESSION.with_traceback(None)
     
     return session
 
@@ -173,6 +262,7 @@ def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
 
 # Type annotations for easier use
 CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUserWithDb = Annotated[Tuple[User, Session], Depends(get_current_user_with_db)]
 OptionalCurrentUser = Annotated[Optional[User], Depends(get_optional_current_user)]
 CurrentActiveUser = Annotated[User, Depends(get_current_active_user)]
 CurrentVerifiedUser = Annotated[User, Depends(get_verified_user)]
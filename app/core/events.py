@@ -3,11 +3,15 @@ Application Events
 Startup and shutdown event handlers
 """
 import logging
+from pathlib import Path
 from app.core.database import create_tables
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Marks that create_tables() already ran, so reloads skip the metadata scan
+TABLES_CREATED_SENTINEL = Path(".tables_created")
+
 
 async def startup_handler() -> None:
     """
@@ -17,8 +21,9 @@ async def startup_handler() -> None:
     
     # Create database tables if they don't exist
     # Note: In production, use Alembic migrations instead
-    if settings.DEBUG:
+    if settings.AUTO_CREATE_TABLES and not TABLES_CREATED_SENTINEL.exists():
         create_tables()
+        TABLES_CREATED_SENTINEL.touch()
         logger.info("Database tables created")
     
     logger.info("Application startup complete")
@@ -29,4 +34,12 @@ async def shutdown_handler() -> None:
     Handle application shutdown
     """
     logger.info("Shutting down application...")
+    
+    # Let verification/welcome emails queued by requests finish sending
+    from app.services.auth import drain_background_emails
+    await drain_background_emails()
+    
+    from app.services.google_oauth import google_oauth_service
+    await google_oauth_service.aclose()
+    
     logger.info("Application shutdown complete")
@@ -4,9 +4,10 @@ File storage implementations (local, S3, etc.)
 """
 
 from app.integrations.storage.local import LocalStorage
-from app.integrations.storage.s3 import S3Storage
+from app.integrations.storage.s3 import S3Storage, get_s3_storage
 
 __all__ = [
     "LocalStorage",
     "S3Storage",
+    "get_s3_storage",
 ]
\ No newline at end of file
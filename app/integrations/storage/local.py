@@ -2,14 +2,56 @@
 Local Storage Implementation
 For development and testing purposes
 """
+import asyncio
+import io
 import os
 import shutil
+import tempfile
 from typing import Optional, BinaryIO
 import logging
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _source_fd(file_obj: BinaryIO) -> Optional[int]:
+    """File descriptor backing file_obj, or None when it is memory-backed"""
+    # fileno() on an in-memory SpooledTemporaryFile would force it to disk
+    if isinstance(file_obj, tempfile.SpooledTemporaryFile) and not file_obj._rolled:
+        return None
+    try:
+        return file_obj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _copy_to_path(file_obj: BinaryIO, file_path: Path) -> None:
+    """Copy file_obj into file_path, in-kernel via sendfile when possible"""
+    in_fd = _source_fd(file_obj) if hasattr(os, "sendfile") else None
+    
+    with open(file_path, 'wb') as f:
+        if in_fd is not None:
+            start = offset = file_obj.tell()
+            remaining = os.fstat(in_fd).st_size - offset
+            try:
+                while remaining > 0:
+                    sent = os.sendfile(f.fileno(), in_fd, offset, remaining)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+                file_obj.seek(offset)
+                return
+            except OSError:
+                # Platform refuses file-to-file sendfile; start over with a buffered copy
+                file_obj.seek(start)
+                f.seek(0)
+                f.truncate(0)
+        
+        shutil.copyfileobj(file_obj, f, length=COPY_BUFFER_SIZE)
+
 
 class LocalStorage:
     """Local file system storage for development"""
@@ -39,8 +81,7 @@ class LocalStorage:
             file_path = self.base_path / object_key
             file_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(file_path, 'wb') as f:
-                shutil.copyfileobj(file_obj, f)
+            await asyncio.to_thread(_copy_to_path, file_obj, file_path)
             
             logger.info(f"File saved locally: {file_path}")
             return True
@@ -2,14 +2,39 @@
 S3 Storage Integration
 AWS S3 or S3-compatible storage for file uploads
 """
+import asyncio
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from cachetools import TTLCache
+from functools import lru_cache
 from typing import Optional, BinaryIO
 import logging
+import threading
+import time
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Shared by every request thread; the default pool of 10 serializes concurrent uploads
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+
+# Multipart, threaded transfers for large files; concurrency stays within the client pool
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    max_concurrency=10,
+    multipart_chunksize=8 * 1024 * 1024,
+    use_threads=True,
+)
+
+# Signed GET URLs are reused for at most this long (and never past half their lifetime)
+PRESIGNED_CACHE_TTL_SECONDS = 300
+
 
 class S3Storage:
     """S3 storage client for file operations"""
@@ -37,8 +62,18 @@ class S3Storage:
         if settings.S3_ENDPOINT_URL:
             client_kwargs['endpoint_url'] = settings.S3_ENDPOINT_URL
 
-        self.s3_client = self.session.client('s3', **client_kwargs)
+        self.s3_client = self.session.client('s3', config=S3_CLIENT_CONFIG, **client_kwargs)
         self.bucket_name = settings.S3_BUCKET_NAME
+        
+        # (object_key, expires_in) -> (url, reusable_until)
+        self._presigned_cache: TTLCache = TTLCache(maxsize=10_000, ttl=PRESIGNED_CACHE_TTL_SECONDS)
+        self._presigned_lock = threading.Lock()
+    
+    def invalidate_presigned(self, object_key: str) -> None:
+        """Drop cached presigned URLs for an object"""
+        with self._presigned_lock:
+            for key in [key for key in self._presigned_cache if key[0] == object_key]:
+                self._presigned_cache.pop(key, None)
     
     async def upload_file(
         self, 
@@ -62,11 +97,14 @@ class S3Storage:
             if content_type:
                 extra_args['ContentType'] = content_type
             
-            self.s3_client.upload_fileobj(
+            # boto3 blocks, so run it off the event loop
+            await asyncio.to_thread(
+                self.s3_client.upload_fileobj,
                 file_obj,
                 self.bucket_name,
                 object_key,
-                ExtraArgs=extra_args
+                ExtraArgs=extra_args,
+                Config=TRANSFER_CONFIG
             )
             
             logger.info(f"File uploaded successfully: {object_key}")
@@ -88,10 +126,12 @@ class S3Storage:
             bool: True if successful, False otherwise
         """
         try:
-            self.s3_client.download_file(
+            await asyncio.to_thread(
+                self.s3_client.download_file,
                 self.bucket_name,
                 object_key,
-                local_path
+                local_path,
+                Config=TRANSFER_CONFIG
             )
             
             logger.info(f"File downloaded successfully: {object_key}")
@@ -112,11 +152,13 @@ class S3Storage:
             bool: True if successful, False otherwise
         """
         try:
-            self.s3_client.delete_object(
+            await asyncio.to_thread(
+                self.s3_client.delete_object,
                 Bucket=self.bucket_name,
                 Key=object_key
             )
             
+            self.invalidate_presigned(object_key)
             logger.info(f"File deleted successfully: {object_key}")
             return True
             
@@ -139,12 +181,27 @@ class S3Storage:
         Returns:
             str: Presigned URL or None if error
         """
+        # Round down to a whole minute so near-identical requests share a URL
+        expires_in = expiration - expiration % 60 if expiration >= 60 else expiration
+        cache_key = (object_key, expires_in)
+        now = time.monotonic()
+        
+        with self._presigned_lock:
+            cached = self._presigned_cache.get(cache_key)
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        
         try:
-            url = self.s3_client.generate_presigned_url(
+            url = await asyncio.to_thread(
+                self.s3_client.generate_presigned_url,
                 'get_object',
                 Params={'Bucket': self.bucket_name, 'Key': object_key},
-                ExpiresIn=expiration
+                ExpiresIn=expires_in
             )
+            
+            reusable_until = now + min(PRESIGNED_CACHE_TTL_SECONDS, expires_in // 2)
+            with self._presigned_lock:
+                self._presigned_cache[cache_key] = (url, reusable_until)
             return url
             
         except ClientError as e:
@@ -152,5 +209,7 @@ class S3Storage:
             return None
 
 
-# Global S3 storage instance
-s3_storage = S3Storage()
+@lru_cache(maxsize=1)
+def get_s3_storage() -> S3Storage:
+    """Get the shared S3 storage instance, creating it on first use"""
+    return S3Storage()
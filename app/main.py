@@ -4,12 +4,22 @@ EduCapture - Educational Note Enhancement Platform
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import importlib
+import re
 
 from app.core.config import settings
-from app.core.database import engine
+from app.core.database import DBSessionMiddleware
 from app.core.events import startup_handler, shutdown_handler
-from app.api import health, realtime, auth, study_helper
+
+# Router name -> (module, URL prefix, tags); modules are imported on demand
+ROUTERS = {
+    "health": ("app.api.health", f"{settings.API_V1_STR}/health", ["health"]),
+    "auth": ("app.api.auth", f"{settings.API_V1_STR}/auth", ["authentication"]),
+    "realtime": ("app.api.realtime", f"{settings.API_V1_STR}/realtime", ["realtime"]),
+    "study_helper": ("app.api.study_helper", f"{settings.API_V1_STR}", ["study-helper"]),
+}
 
 
 @asynccontextmanager
@@ -28,23 +38,28 @@ def create_application() -> FastAPI:
         description="EduCapture - Upload, enhance and organize your educational notes with AI-powered tools",
         version="1.0.0",
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        default_response_class=ORJSONResponse,
         lifespan=lifespan
     )
 
-    # CORS Configuration
+    # CORS Configuration: one anchored pattern for all allowed origins
+    origin_regex = "^(" + "|".join(re.escape(host) for host in settings.ALLOWED_HOSTS) + ")$"
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=settings.ALLOWED_HOSTS,
+        allow_origin_regex=origin_regex,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
     )
 
-    # Include API routers
-    app.include_router(health.router, prefix=f"{settings.API_V1_STR}/health", tags=["health"])
-    app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["authentication"])
-    app.include_router(realtime.router, prefix=f"{settings.API_V1_STR}/realtime", tags=["realtime"])
-    app.include_router(study_helper.router, prefix=f"{settings.API_V1_STR}", tags=["study-helper"])
+    # One database session per request, released when the response completes
+    app.add_middleware(DBSessionMiddleware)
+
+    # Include API routers; workers can be limited to a subset via ENABLED_ROUTERS
+    for name in settings.ENABLED_ROUTERS:
+        module_name, prefix, tags = ROUTERS[name]
+        module = importlib.import_module(module_name)
+        app.include_router(module.router, prefix=prefix, tags=tags)
 
     return app
 
@@ -59,5 +74,9 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else settings.WORKERS,
+        # uvloop is picked automatically where supported (not on Windows)
+        loop="auto",
+        http="httptools",
         log_level="info"
     )
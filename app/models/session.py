@@ -2,7 +2,7 @@
 User Session Model
 SQLAlchemy model for managing user sessions and refresh tokens
 """
-from sqlalchemy import Column, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, String, DateTime, Boolean, Text, ForeignKey, Index, LargeBinary, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -14,6 +14,16 @@ class UserSession(Base):
     """User session model for multiple session support"""
     
     __tablename__ = "user_sessions"
+    __table_args__ = (
+        # Partial index for the hot lookup of live sessions by refresh token
+        Index(
+            "ix_user_sessions_refresh_token_live",
+            "refresh_token_hash",
+            postgresql_where=text("is_active AND NOT is_revoked")
+        ),
+    )
+    # Fetch server-generated timestamps during the INSERT/UPDATE itself
+    __mapper_args__ = {"eager_defaults": True}
     
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -22,7 +32,7 @@ class UserSession(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     
     # Session details
-    refresh_token = Column(String(500), unique=True, nullable=False, index=True)
+    refresh_token_hash = Column(LargeBinary(32), unique=True, nullable=False, index=True)  # SHA-256 of the refresh token
     access_token_jti = Column(String(255), nullable=False, index=True)  # JWT ID for access token
     
     # Device and browser information
@@ -2,7 +2,8 @@
 User Model
 SQLAlchemy model for user authentication and profile management
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Text, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Text, Enum, Index, and_, text
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -29,6 +30,18 @@ class User(Base):
     """User model for authentication and profile management"""
     
     __tablename__ = "users"
+    __table_args__ = (
+        # Covers the per-request id lookup together with the can_login filter
+        Index("ix_users_id_login_eligibility", "id", "status", "is_active", "is_email_verified"),
+        # Only pending verifications carry a token, so the index stays small
+        Index(
+            "ix_users_email_verification_token",
+            "email_verification_token",
+            postgresql_where=text("email_verification_token IS NOT NULL")
+        ),
+    )
+    # Fetch server-generated timestamps during the INSERT/UPDATE itself
+    __mapper_args__ = {"eager_defaults": True}
     
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -85,11 +98,20 @@ class User(Base):
         """Check if user registered via OAuth"""
         return self.auth_provider != AuthProvider.EMAIL
     
-    @property
+    @hybrid_property
     def can_login(self):
         """Check if user can login"""
         return (
-            self.status in [UserStatus.ACTIVE] and
+            self.status == UserStatus.ACTIVE and
             self.is_active and
             self.is_email_verified
         )
+    
+    @can_login.expression
+    def can_login(cls):
+        """SQL form of can_login, usable in query filters"""
+        return and_(
+            cls.status == UserStatus.ACTIVE,
+            cls.is_active.is_(True),
+            cls.is_email_verified.is_(True)
+        )
@@ -2,44 +2,130 @@
 Authentication Schemas
 Pydantic models for API request/response validation
 """
-from pydantic import BaseModel, EmailStr, ConfigDict, Field, validator
-from typing import Optional, List
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, WithJsonSchema
+from pydantic.networks import validate_email
+from typing import Annotated, Optional, List
 from datetime import datetime, date
 from uuid import UUID
+import re
+from enum import Enum
+from functools import cached_property
+
+
+# Plain ASCII addresses that email-validator would accept unchanged apart
+# from lowercasing the domain; anything else (surrounding whitespace, "--"
+# in a domain label, which IDNA decodes or rejects, ...) takes the full
+# validation path
+_EMAIL_LOCAL = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+_EMAIL_LABEL = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+_EMAIL_RE = re.compile(rf"\A({_EMAIL_LOCAL})@((?:{_EMAIL_LABEL}\.)+([A-Za-z]{{2,63}}))\Z")
+_EMAIL_SPECIAL_USE_TLDS = frozenset({"arpa", "invalid", "local", "localhost", "onion", "test"})
+
+
+def normalize_email(value: str) -> str:
+    """Validate and normalize an email address exactly as EmailStr does"""
+    match = _EMAIL_RE.match(value)
+    if (
+        match
+        and len(match.group(1)) <= 64
+        and len(value) <= 254
+        and match.group(3).lower() not in _EMAIL_SPECIAL_USE_TLDS
+        and "--" not in match.group(2)
+    ):
+        return f"{match.group(1)}@{match.group(2).lower()}"
+    
+    _, email = validate_email(value)
+    return email
+
+
+# Shared email field type for all request schemas
+Email = Annotated[
+    str,
+    AfterValidator(normalize_email),
+    WithJsonSchema({"type": "string", "format": "email"}),
+]
+
+
+# Password complexity: one bit per required character class
+_PASSWORD_SPECIALS = '!@#$%^&*()_+-=[]{}|;:,.<>?'
+_PASSWORD_CLASSES = (
+    (1, 'uppercase letter'),
+    (2, 'lowercase letter'),
+    (4, 'digit'),
+    (8, 'special character'),
+)
+_PASSWORD_ALL_CLASSES = 15
+
+
+def _char_class(c: str) -> int:
+    """Class bits for a single character"""
+    return (
+        (1 if c.isupper() else 0)
+        | (2 if c.islower() else 0)
+        | (4 if c.isdigit() else 0)
+        | (8 if c in _PASSWORD_SPECIALS else 0)
+    )
+
+
+# ASCII byte -> class bits, so one translate() classifies the whole password
+_PASSWORD_CLASS_TABLE = bytes(_char_class(chr(i)) if i < 128 else 0 for i in range(256))
+
+
+def _validate_password_complexity(password: str) -> str:
+    """Check that a password contains every required character class"""
+    if password.isascii():
+        seen = set(password.encode().translate(_PASSWORD_CLASS_TABLE))
+    else:
+        # Non-ASCII letters and digits count too, as with str.isupper() etc.
+        seen = set(map(_char_class, password))
+    
+    mask = 0
+    for bits in seen:
+        mask |= bits
+    
+    if mask != _PASSWORD_ALL_CLASSES:
+        missing = [name for bit, name in _PASSWORD_CLASSES if not mask & bit]
+        raise ValueError('Password must contain at least one ' + ', one '.join(missing))
+    return password
+
+
+# Shared password field type: length bounds plus complexity
+Password = Annotated[
+    str,
+    Field(min_length=8, max_length=128),
+    AfterValidator(_validate_password_complexity),
+]
 
 
 # Base schemas
 class BaseResponse(BaseModel):
     """Base response schema"""
     model_config = ConfigDict(from_attributes=True)
+    
+    @classmethod
+    def from_trusted(cls, obj):
+        """Build from an ORM row we loaded ourselves, skipping validation"""
+        values = {}
+        for name in cls.model_fields:
+            value = getattr(obj, name)
+            values[name] = value.value if isinstance(value, Enum) else value
+        return cls.model_construct(**values)
 
 
 # User Registration
 class UserRegisterRequest(BaseModel):
     """User registration request schema"""
-    email: EmailStr
-    password: str = Field(min_length=8, max_length=128)
+    email: Email
+    password: Password
     first_name: str = Field(min_length=1, max_length=100)
     last_name: str = Field(min_length=1, max_length=100)
     date_of_birth: date
-    
-    @validator('password')
-    def validate_password(cls, v):
-        if not any(c.isupper() for c in v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not any(c.islower() for c in v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not any(c.isdigit() for c in v):
-            raise ValueError('Password must contain at least one digit')
-        if not any(c in '!@#$%^&*()_+-=[]{}|;:,.<>?' for c in v):
-            raise ValueError('Password must contain at least one special character')
-        return v
 
 
 # User Login
 class UserLoginRequest(BaseModel):
     """User login request schema"""
-    email: EmailStr
+    email: Email
     password: str
 
 
@@ -91,8 +177,9 @@ class UserResponse(BaseResponse):
     last_login_at: Optional[datetime] = None
     login_count: int
     
-    @property
+    @cached_property
     def full_name(self) -> str:
+        """Full name, formatted once per instance"""
         return f"{self.first_name} {self.last_name}"
 
 
@@ -130,48 +217,24 @@ class SessionListResponse(BaseResponse):
 class ChangePasswordRequest(BaseModel):
     """Change password request schema"""
     current_password: str
-    new_password: str = Field(min_length=8, max_length=128)
-    
-    @validator('new_password')
-    def validate_new_password(cls, v):
-        if not any(c.isupper() for c in v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not any(c.islower() for c in v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not any(c.isdigit() for c in v):
-            raise ValueError('Password must contain at least one digit')
-        if not any(c in '!@#$%^&*()_+-=[]{}|;:,.<>?' for c in v):
-            raise ValueError('Password must contain at least one special character')
-        return v
+    new_password: Password
 
 
 class ForgotPasswordRequest(BaseModel):
     """Forgot password request schema"""
-    email: EmailStr
+    email: Email
 
 
 class ResetPasswordRequest(BaseModel):
     """Reset password request schema"""
     token: str
-    new_password: str = Field(min_length=8, max_length=128)
-    
-    @validator('new_password')
-    def validate_new_password(cls, v):
-        if not any(c.isupper() for c in v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not any(c.islower() for c in v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not any(c.isdigit() for c in v):
-            raise ValueError('Password must contain at least one digit')
-        if not any(c in '!@#$%^&*()_+-=[]{}|;:,.<>?' for c in v):
-            raise ValueError('Password must contain at least one special character')
-        return v
+    new_password: Password
 
 
 # Email verification
 class ResendVerificationRequest(BaseModel):
     """Resend verification email request schema"""
-    email: EmailStr
+    email: Email
 
 
 class VerifyEmailRequest(BaseModel):
@@ -2,29 +2,66 @@
 Authentication Service
 Business logic for user authentication, registration, and session management
 """
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, Coroutine
 from datetime import datetime, timedelta, timezone, date
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, exists, or_, select, update
 from fastapi import HTTPException, status, Request
+import asyncio
 import uuid
 import logging
 
 from app.models import User, UserSession, UserStatus, AuthProvider
 from app.core.auth import (
     hash_password, 
-    verify_password, 
-    create_access_token, 
-    create_refresh_token,
+    verify_password_constant_time,
+    create_token_pair,
     generate_email_verification_token,
     generate_password_reset_token,
-    extract_token_jti
+    hash_refresh_token
 )
 from app.services.email import get_email_service
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Token lifetimes, resolved once from settings
+_REFRESH_TTL = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+_VERIFY_TTL = timedelta(hours=24)
+
+# Strong references to in-flight email sends so they are not garbage collected
+_background_tasks: set = set()
+
+
+def _send_in_background(send: Coroutine[Any, Any, bool], description: str) -> None:
+    """Send an email off the request path, logging the outcome when it finishes"""
+    task = asyncio.create_task(send)
+    _background_tasks.add(task)
+    
+    def _on_done(task: asyncio.Task) -> None:
+        _background_tasks.discard(task)
+        if task.cancelled():
+            logger.warning(f"Cancelled {description}")
+        elif task.exception() is not None:
+            logger.error(f"Failed to send {description}: {task.exception()}")
+        elif task.result():
+            logger.info(f"Sent {description}")
+        else:
+            # The email service already logged this failure with its error
+            logger.debug(f"Failed to send {description} - email service returned False")
+    
+    task.add_done_callback(_on_done)
+
+
+async def drain_background_emails(timeout: float = 10.0) -> None:
+    """Wait for in-flight email sends so shutdown does not drop them"""
+    if not _background_tasks:
+        return
+    logger.info(f"Waiting for {len(_background_tasks)} pending email(s)")
+    _, pending = await asyncio.wait(set(_background_tasks), timeout=timeout)
+    if pending:
+        logger.warning(f"Shutting down with {len(pending)} email(s) still pending")
+
 
 class AuthService:
     """Authentication service for handling user authentication operations"""
@@ -43,9 +80,8 @@ class AuthService:
     ) -> Tuple[User, str]:
         """Register a new user with email verification"""
         
-        # Check if user already exists
-        existing_user = self.db.query(User).filter(User.email == email).first()
-        if existing_user:
+        # Check if user already exists, without loading the row
+        if self.db.execute(select(exists().where(User.email == email))).scalar():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User with this email already exists"
@@ -53,12 +89,15 @@ class AuthService:
         
         # Generate verification token
         verification_token = generate_email_verification_token()
-        verification_expires = datetime.now(timezone.utc) + timedelta(hours=24)
+        verification_expires = datetime.now(timezone.utc) + _VERIFY_TTL
+        
+        # Hash in a worker thread; bcrypt would otherwise block the loop
+        password_hash = await asyncio.to_thread(hash_password, password)
         
         # Create new user
         user = User(
             email=email,
-            password_hash=hash_password(password),
+            password_hash=password_hash,
             first_name=first_name,
             last_name=last_name,
             date_of_birth=date_of_birth,
@@ -71,30 +110,27 @@ class AuthService:
         
         self.db.add(user)
         self.db.commit()
-        self.db.refresh(user)
         
         # Send verification email
         email_service = get_email_service()
         logger.info(f"Attempting to send verification email to {email}...")
-        email_sent = await email_service.send_email_verification(
-            email=email,
-            first_name=first_name,
-            verification_token=verification_token
+        _send_in_background(
+            email_service.send_email_verification(
+                email=email,
+                first_name=first_name,
+                verification_token=verification_token
+            ),
+            f"verification email to {email}"
         )
-
-        if email_sent:
-            logger.info(f"Verification email sent successfully to {email}")
-        else:
-            logger.error(f"Failed to send verification email to {email} - email service returned False")
-            # In production, you might want to:
-            # 1. Store this failure for retry
-            # 2. Send a notification to admins
-            # 3. Provide alternative verification methods to the user
+        # On failure, in production you might want to:
+        # 1. Store this failure for retry
+        # 2. Send a notification to admins
+        # 3. Provide alternative verification methods to the user
 
         logger.info(f"User registered successfully: {email}")
         return user, verification_token
     
-    def login_user(
+    async def login_user(
         self,
         email: str,
         password: str,
@@ -104,6 +140,15 @@ class AuthService:
         
         # Find user by email
         user = self.db.query(User).filter(User.email == email).first()
+        
+        # Always pay the hash cost, so unknown emails are not distinguishable
+        # by timing; bcrypt runs in a worker thread to keep the loop free
+        password_valid = await asyncio.to_thread(
+            verify_password_constant_time,
+            password,
+            user.password_hash if user else None
+        )
+        
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -112,7 +157,7 @@ class AuthService:
         
         # Verify password for email auth users
         if user.auth_provider == AuthProvider.EMAIL:
-            if not user.password_hash or not verify_password(password, user.password_hash):
+            if not password_valid:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Invalid credentials"
@@ -132,22 +177,15 @@ class AuthService:
                 )
         
         # Create tokens
-        access_token = create_access_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-        refresh_token = create_refresh_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-        
-        # Extract access token JTI
-        access_token_jti = extract_token_jti(access_token)
+        access_token, refresh_token, access_token_jti = create_token_pair(user)
         
         # Create session
         session = self._create_user_session(
             user=user,
             refresh_token=refresh_token,
             access_token_jti=access_token_jti,
-            request=request
+            request=request,
+            commit=False
         )
         
         # Update user login info
@@ -170,8 +208,11 @@ class AuthService:
     ) -> Tuple[User, str, str, UserSession]:
         """Register a new user via Google OAuth"""
         
-        # Check if user already exists with this email
-        existing_user = self.db.query(User).filter(User.email == email).first()
+        # Check if user already exists with this email; one query serves both
+        # the new-user and the linking paths
+        existing_user = self.db.execute(
+            select(User).where(User.email == email)
+        ).scalar_one_or_none()
         if existing_user:
             if existing_user.auth_provider == AuthProvider.GOOGLE:
                 # User exists with Google auth, just login
@@ -187,7 +228,6 @@ class AuthService:
                     existing_user.last_name = last_name
                 
                 self.db.commit()
-                self.db.refresh(existing_user)
                 return await self._google_login_existing_user(existing_user, request)
         
         # Create new Google user
@@ -205,22 +245,15 @@ class AuthService:
         
         self.db.add(user)
         self.db.commit()
-        self.db.refresh(user)
         
         # Create tokens and session
-        access_token = create_access_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-        refresh_token = create_refresh_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-        
-        access_token_jti = extract_token_jti(access_token)
+        access_token, refresh_token, access_token_jti = create_token_pair(user)
         session = self._create_user_session(
             user=user,
             refresh_token=refresh_token,
             access_token_jti=access_token_jti,
-            request=request
+            request=request,
+            commit=False
         )
         
         # Update login info
@@ -228,16 +261,15 @@ class AuthService:
         user.login_count += 1
         self.db.commit()
         
-        logger.info(f"Google user registered successfully: {email}")
-        return user, access_token, refresh_token, session
-        self.db.commit()
-        
         # Send welcome email
         email_service = get_email_service()
-        await email_service.send_welcome_email(
-            email=email,
-            first_name=first_name,
-            auth_provider="google"
+        _send_in_background(
+            email_service.send_welcome_email(
+                email=email,
+                first_name=first_name,
+                auth_provider="google"
+            ),
+            f"welcome email to {email}"
         )
         
         logger.info(f"Google user registered successfully: {email}")
@@ -257,19 +289,13 @@ class AuthService:
             )
         
         # Create tokens and session
-        access_token = create_access_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-        refresh_token = create_refresh_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-        
-        access_token_jti = extract_token_jti(access_token)
+        access_token, refresh_token, access_token_jti = create_token_pair(user)
         session = self._create_user_session(
             user=user,
             refresh_token=refresh_token,
             access_token_jti=access_token_jti,
-            request=request
+            request=request,
+            commit=False
         )
         
         # Update login info
@@ -285,20 +311,21 @@ class AuthService:
         user: User,
         refresh_token: str,
         access_token_jti: str,
-        request: Request
+        request: Request,
+        commit: bool = True
     ) -> UserSession:
-        """Create a new user session"""
+        """Create a new user session; with commit=False the caller commits it"""
         
         # Extract device info from request
         user_agent = request.headers.get("user-agent", "")
         ip_address = request.client.host if request.client else ""
         
         # Create session
-        expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        expires_at = datetime.now(timezone.utc) + _REFRESH_TTL
         
         session = UserSession(
             user_id=user.id,
-            refresh_token=refresh_token,
+            refresh_token_hash=hash_refresh_token(refresh_token),
             access_token_jti=access_token_jti,
             user_agent=user_agent,
             ip_address=ip_address,
@@ -306,8 +333,8 @@ class AuthService:
         )
         
         self.db.add(session)
-        self.db.commit()
-        self.db.refresh(session)
+        if commit:
+            self.db.commit()
         
         return session
     
@@ -315,13 +342,15 @@ class AuthService:
         self,
         refresh_token: str,
         request: Request
-    ) -> Tuple[str, str, UserSession]:
+    ) -> Tuple[str, str, UserSession, User]:
         """Refresh access token using refresh token"""
         
         # Find session by refresh token
-        session = self.db.query(UserSession).filter(
-            UserSession.refresh_token == refresh_token
-        ).first()
+        session = self.db.execute(
+            select(UserSession).where(
+                UserSession.refresh_token_hash == hash_refresh_token(refresh_token)
+            )
+        ).scalar_one_or_none()
         
         if not session or not session.is_valid:
             raise HTTPException(
@@ -329,7 +358,7 @@ class AuthService:
                 detail="Invalid or expired refresh token"
             )
         
-        # Get user
+        # Get user; the full row is returned for the response body
         user = self.db.query(User).filter(User.id == session.user_id).first()
         if not user or not user.can_login:
             raise HTTPException(
@@ -338,30 +367,28 @@ class AuthService:
             )
         
         # Create new tokens
-        new_access_token = create_access_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-        new_refresh_token = create_refresh_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
+        new_access_token, new_refresh_token, access_token_jti = create_token_pair(user)
         
         # Update session
-        session.refresh_token = new_refresh_token
-        session.access_token_jti = extract_token_jti(new_access_token)
-        session.last_used_at = datetime.now(timezone.utc)
-        session.expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        session.refresh_token_hash = hash_refresh_token(new_refresh_token)
+        session.access_token_jti = access_token_jti
+        now = datetime.now(timezone.utc)
+        session.last_used_at = now
+        session.expires_at = now + _REFRESH_TTL
         
         self.db.commit()
         
         logger.info(f"Tokens refreshed for user: {user.email}")
-        return new_access_token, new_refresh_token, session
+        return new_access_token, new_refresh_token, session, user
     
     def logout_user(self, refresh_token: str) -> bool:
         """Logout user by invalidating session"""
         
-        session = self.db.query(UserSession).filter(
-            UserSession.refresh_token == refresh_token
-        ).first()
+        session = self.db.execute(
+            select(UserSession).where(
+                UserSession.refresh_token_hash == hash_refresh_token(refresh_token)
+            )
+        ).scalar_one_or_none()
         
         if session:
             session.is_active = False
@@ -377,22 +404,22 @@ class AuthService:
     def logout_all_sessions(self, user_id: uuid.UUID) -> int:
         """Logout user from all sessions"""
         
-        sessions = self.db.query(UserSession).filter(
+        # Single bulk UPDATE; the rows are never loaded into the session
+        stmt = update(UserSession).where(
             and_(
                 UserSession.user_id == user_id,
                 UserSession.is_active == True,
                 UserSession.is_revoked == False
             )
-        ).all()
-        
-        revoked_count = 0
-        for session in sessions:
-            session.is_active = False
-            session.is_revoked = True
-            session.revoked_at = datetime.now(timezone.utc)
-            revoked_count += 1
+        ).values(
+            is_active=False,
+            is_revoked=True,
+            revoked_at=datetime.now(timezone.utc)
+        ).execution_options(synchronize_session=False)
         
+        result = self.db.execute(stmt)
         self.db.commit()
+        revoked_count = result.rowcount
         
         logger.info(f"All sessions revoked for user: {user_id}, count: {revoked_count}")
         return revoked_count
@@ -400,13 +427,23 @@ class AuthService:
     async def verify_email(self, token: str) -> User:
         """Verify user email with token"""
         
-        user = self.db.query(User).filter(
-            and_(
+        # Check and consume the token in one UPDATE ... RETURNING round
+        # trip; the token match uses the partial token index
+        user = self.db.execute(
+            update(User)
+            .where(
                 User.email_verification_token == token,
+                User.is_email_verified.is_(False),
                 User.email_verification_expires_at > datetime.now(timezone.utc),
-                User.is_email_verified == False
             )
-        ).first()
+            .values(
+                is_email_verified=True,
+                status=UserStatus.ACTIVE,
+                email_verification_token=None,
+                email_verification_expires_at=None,
+            )
+            .returning(User)
+        ).scalar_one_or_none()
         
         if not user:
             raise HTTPException(
@@ -414,19 +451,20 @@ class AuthService:
                 detail="Invalid or expired verification token"
             )
         
-        # Update user
-        user.is_email_verified = True
-        user.status = UserStatus.ACTIVE
-        user.email_verification_token = None
-        user.email_verification_expires_at = None
-        
         self.db.commit()
         
+        # Core UPDATE skips the ORM events that keep the auth cache current
+        from app.core.dependencies import invalidate_user
+        invalidate_user(user.id)
+        
         # Send welcome email
         email_service = get_email_service()
-        await email_service.send_welcome_email(
-            email=user.email,
-            first_name=user.first_name
+        _send_in_background(
+            email_service.send_welcome_email(
+                email=user.email,
+                first_name=user.first_name
+            ),
+            f"welcome email to {user.email}"
         )
         
         logger.info(f"Email verified for user: {user.email}")
@@ -450,7 +488,7 @@ class AuthService:
         
         # Generate new verification token
         verification_token = generate_email_verification_token()
-        verification_expires = datetime.now(timezone.utc) + timedelta(hours=24)
+        verification_expires = datetime.now(timezone.utc) + _VERIFY_TTL
         
         user.email_verification_token = verification_token
         user.email_verification_expires_at = verification_expires
@@ -459,10 +497,13 @@ class AuthService:
         
         # Send verification email
         email_service = get_email_service()
-        await email_service.send_email_verification(
-            email=email,
-            first_name=user.first_name,
-            verification_token=verification_token
+        _send_in_background(
+            email_service.send_email_verification(
+                email=email,
+                first_name=user.first_name,
+                verification_token=verification_token
+            ),
+            f"verification email to {email}"
         )
         
         logger.info(f"Verification email resent to: {email}")
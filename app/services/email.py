@@ -2,13 +2,73 @@
 Email Service
 Email sending functionality for user verification and notifications
 """
-from typing import List, Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+from aiolimiter import AsyncLimiter
+from cachetools import LRUCache
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+from markupsafe import Markup, escape
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class _RepeatedTracebackFilter(logging.Filter):
+    """Keep every failure line but drop repeated tracebacks within a window, so
+    an SMTP outage logs one traceback per minute plus one line per recipient"""
+    
+    def __init__(self, window_seconds: float = 60.0):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self._last_seen: Dict[tuple, float] = {}
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.exc_info:
+            return True
+        # Keyed on the message template, so the key set stays bounded
+        key = (record.msg, record.exc_info[0])
+        last = self._last_seen.get(key)
+        if last is not None and record.created - last < self.window_seconds:
+            record.exc_info = None
+            record.exc_text = None
+        else:
+            self._last_seen[key] = record.created
+        return True
+
+
+logger.addFilter(_RepeatedTracebackFilter())
+
+TEMPLATE_FOLDER = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+# Templates are parsed once at import and only rendered per email
+_template_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_FOLDER),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    cache_size=-1
+)
+VERIFY_EMAIL_TEMPLATE = _template_env.get_template("verify_email.html")
+PASSWORD_RESET_TEMPLATE = _template_env.get_template("password_reset.html")
+WELCOME_TEMPLATE = _template_env.get_template("welcome.html")
+
+# Stands in for the per-email link in cached renders. Autoescaping turns
+# the same text inside a user-supplied name into entities, so it cannot collide
+_URL_PLACEHOLDER = Markup("<email-url/>")
+
+
+@lru_cache(maxsize=1024)
+def _render_for_name(template: Template, url_field: str, first_name: str) -> str:
+    """Render a template once per recipient name, leaving the link as a placeholder"""
+    return template.render(first_name=first_name, **{url_field: _URL_PLACEHOLDER})
+
+
+def render_email(template: Template, url_field: str, first_name: str, url: str) -> str:
+    """Render an email body, reusing the cached render for this name"""
+    return _render_for_name(template, url_field, first_name).replace(_URL_PLACEHOLDER, escape(url))
+
 # Email configuration
 def get_email_config() -> ConnectionConfig:
     """Get email configuration"""
@@ -23,7 +83,7 @@ def get_email_config() -> ConnectionConfig:
         MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
         USE_CREDENTIALS=settings.USE_CREDENTIALS,
         VALIDATE_CERTS=settings.VALIDATE_CERTS,
-        TEMPLATE_FOLDER="app/templates/email"
+        TEMPLATE_FOLDER=TEMPLATE_FOLDER
     )
 
 
@@ -33,6 +93,25 @@ class EmailService:
     def __init__(self):
         self.config = get_email_config()
         self.fast_mail = FastMail(self.config)
+        # Smooths bursts to the SMTP provider's sending quota
+        self._limiter = AsyncLimiter(max_rate=settings.MAIL_RATE_LIMIT, time_period=1.0)
+        # Per-recipient limiters, least recently used evicted first
+        self._recipient_limiters: LRUCache = LRUCache(maxsize=10_000)
+    
+    def _recipient_limiter(self, email: str) -> AsyncLimiter:
+        """Get the rate limiter for a single recipient address"""
+        key = email.lower()
+        limiter = self._recipient_limiters.get(key)
+        if limiter is None:
+            limiter = AsyncLimiter(max_rate=settings.MAIL_RECIPIENT_RATE_LIMIT, time_period=60.0)
+            self._recipient_limiters[key] = limiter
+        return limiter
+    
+    async def _send(self, email: str, message: MessageSchema) -> None:
+        """Send a message once both the recipient and global rate limits allow it"""
+        async with self._recipient_limiter(email):
+            async with self._limiter:
+                await self.fast_mail.send_message(message)
     
     async def send_email_verification(
         self,
@@ -46,44 +125,9 @@ class EmailService:
             verification_url = f"{settings.FRONTEND_URL}/auth/verify-email?token={verification_token}"
             logger.info(f"Verification URL: {verification_url}")
             
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <title>Verify Your Email - EduCapture</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                    .content {{ background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; }}
-                    .button {{ display: inline-block; background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-                    .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 14px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>Welcome to EduCapture!</h1>
-                    </div>
-                    <div class="content">
-                        <h2>Hi {first_name},</h2>
-                        <p>Thank you for registering with EduCapture. To complete your registration and start uploading and enhancing your notes, please verify your email address.</p>
-                        <p>Click the button below to verify your email:</p>
-                        <a href="{verification_url}" class="button">Verify Email Address</a>
-                        <p>Or copy and paste this link into your browser:</p>
-                        <p style="word-break: break-all; color: #667eea;">{verification_url}</p>
-                        <p>This verification link will expire in 24 hours for security reasons.</p>
-                        <p>If you didn't create an account with EduCapture, please ignore this email.</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2024 EduCapture. All rights reserved.</p>
-                        <p>This is an automated message, please do not reply to this email.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            html_content = render_email(
+                VERIFY_EMAIL_TEMPLATE, "verification_url", first_name, verification_url
+            )
             
             logger.info(f"Creating message schema for {email}")
             message = MessageSchema(
@@ -94,15 +138,12 @@ class EmailService:
             )
             
             logger.info(f"Sending message via FastMail to {email}")
-            await self.fast_mail.send_message(message)
+            await self._send(email, message)
             logger.info(f"Verification email sent successfully to {email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send verification email to {email}: {str(e)}")
-            logger.error(f"Exception type: {type(e).__name__}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Failed to send verification email to %s: %s", email, e)
             return False
     
     async def send_password_reset(
@@ -115,47 +156,9 @@ class EmailService:
         try:
             reset_url = f"{settings.FRONTEND_URL}/auth/reset-password?token={reset_token}"
             
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <title>Reset Your Password - EduCapture</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                    .content {{ background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; }}
-                    .button {{ display: inline-block; background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-                    .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 14px; }}
-                    .warning {{ background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; margin: 15px 0; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>Password Reset Request</h1>
-                    </div>
-                    <div class="content">
-                        <h2>Hi {first_name},</h2>
-                        <p>We received a request to reset your password for your EduCapture account.</p>
-                        <p>Click the button below to reset your password:</p>
-                        <a href="{reset_url}" class="button">Reset Password</a>
-                        <p>Or copy and paste this link into your browser:</p>
-                        <p style="word-break: break-all; color: #667eea;">{reset_url}</p>
-                        <div class="warning">
-                            <strong>Important:</strong> This reset link will expire in 1 hour for security reasons. If you didn't request a password reset, please ignore this email and consider updating your account security.
-                        </div>
-                        <p>For your security, never share this link with anyone.</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2024 EduCapture. All rights reserved.</p>
-                        <p>This is an automated message, please do not reply to this email.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            html_content = render_email(
+                PASSWORD_RESET_TEMPLATE, "reset_url", first_name, reset_url
+            )
             
             message = MessageSchema(
                 subject="Reset Your Password - EduCapture",
@@ -164,12 +167,12 @@ class EmailService:
                 subtype=MessageType.html
             )
             
-            await self.fast_mail.send_message(message)
+            await self._send(email, message)
             logger.info(f"Password reset email sent to {email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send password reset email to {email}: {str(e)}")
+            logger.exception("Failed to send password reset email to %s: %s", email, e)
             return False
     
     async def send_welcome_email(
@@ -182,59 +185,9 @@ class EmailService:
         try:
             dashboard_url = f"{settings.FRONTEND_URL}/dashboard"
             
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <title>Welcome to EduCapture!</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                    .content {{ background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; }}
-                    .button {{ display: inline-block; background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-                    .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 14px; }}
-                    .feature {{ background: white; padding: 20px; margin: 15px 0; border-radius: 5px; border-left: 4px solid #667eea; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🎉 Welcome to EduCapture!</h1>
-                    </div>
-                    <div class="content">
-                        <h2>Hi {first_name},</h2>
-                        <p>Your account has been successfully verified and you're now ready to start using EduCapture!</p>
-                        
-                        <div class="feature">
-                            <h3>📝 Upload Your Notes</h3>
-                            <p>Upload both handwritten and printed notes in various formats</p>
-                        </div>
-                        
-                        <div class="feature">
-                            <h3>✨ Enhance & Organize</h3>
-                            <p>Use our AI-powered tools to enhance and organize your study materials</p>
-                        </div>
-                        
-                        <div class="feature">
-                            <h3>🔍 Search & Discover</h3>
-                            <p>Easily find and access your notes with powerful search capabilities</p>
-                        </div>
-                        
-                        <p>Ready to get started?</p>
-                        <a href="{dashboard_url}" class="button">Go to Dashboard</a>
-                        
-                        <p>If you have any questions or need help getting started, don't hesitate to reach out to our support team.</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2024 EduCapture. All rights reserved.</p>
-                        <p>This is an automated message, please do not reply to this email.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            html_content = render_email(
+                WELCOME_TEMPLATE, "dashboard_url", first_name, dashboard_url
+            )
             
             message = MessageSchema(
                 subject="Welcome to EduCapture - Let's Get Started!",
@@ -243,21 +196,16 @@ class EmailService:
                 subtype=MessageType.html
             )
             
-            await self.fast_mail.send_message(message)
+            await self._send(email, message)
             logger.info(f"Welcome email sent to {email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send welcome email to {email}: {str(e)}")
+            logger.exception("Failed to send welcome email to %s: %s", email, e)
             return False
 
 
-# Global email service instance - initialized lazily
-_email_service_instance = None
-
+@lru_cache(maxsize=1)
 def get_email_service() -> EmailService:
     """Get email service instance (lazy loading)"""
-    global _email_service_instance
-    if _email_service_instance is None:
-        _email_service_instance = EmailService()
-    return _email_service_instance
+    return EmailService()
@@ -3,18 +3,90 @@ Enhanced Document Processing Service
 Handles chunked document processing with mathematical content support
 """
 import asyncio
+import copy
+import hashlib
 import logging
 import re
-import json
-from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime
-import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, List, Optional, Sized, Tuple
+from contextlib import asynccontextmanager
+from functools import cached_property, lru_cache
 
-from app.agent.workflow import StudyHelperWorkflow
+from aiolimiter import AsyncLimiter
+from cachetools import LRUCache
+
+from app.agent.workflow import StudyHelperWorkflow, get_workflow
 from app.agent.schemas import ImageProcessingState, TextExtractionResult
 
 logger = logging.getLogger(__name__)
 
+# Content detection patterns, one compiled alternation per category
+_MATH_RE = re.compile("|".join([
+    r'\$[^$]+\$',  # LaTeX inline math
+    r'\$\$[^$]+\$\$',  # LaTeX block math
+    # Simple equations: an '=' followed by an operand. Matching the left-hand
+    # side as well only made the search quadratic on long runs of text
+    r'=[a-zA-Z0-9\s+\-*/()^]',
+    r'\\[a-zA-Z]+',  # LaTeX commands
+    r'[∑∫π√∞±≈≠≤≥αβγδθλμσφψω]',  # Mathematical symbols
+]), re.IGNORECASE)
+# Common chemicals, checked by set lookup before any regex runs
+_CHEM_TOKENS = frozenset({
+    "H2O", "CO2", "NaCl", "CH4", "O2", "N2", "Ca(OH)2", "H2SO4", "HCl", "NaOH",
+    "CO", "NH3", "HNO3", "KOH", "CaCO3", "C6H12O6", "H2", "NaHCO3", "KCl", "H2O2",
+})
+_CHEM_TOKEN_STRIP = ".,;:!?[]"
+# Formulas of two or more element groups with at least one count, so plain
+# capitalized words do not match
+_STRICT_CHEM_RE = re.compile(
+    r'\b(?=[A-Za-z\d()]*\d)(?:[A-Z][a-z]?\d*|\((?:[A-Z][a-z]?\d*)+\)\d*){2,}'
+)
+# Only existence matters, so each pattern checks a single character on either
+# side of the marker; unbounded runs there made the search backtrack
+# quadratically over long digit or letter runs
+_SUPERSUB_RE = re.compile("|".join([
+    r'\^[a-zA-Z0-9]',  # Superscript
+    r'_[a-zA-Z0-9]',   # Subscript (also covers variables with subscripts)
+    r'[0-9]\^[0-9]',  # Number with superscript
+    r'x²|x³|m²|cm³|kg/m³',  # Common superscript/subscript patterns
+]), re.IGNORECASE)
+
+# Math expressions that must not be split across chunks: inline LaTeX math
+# on one line, or a LaTeX command with an optional argument
+_MATH_EXPR_RE = re.compile(r'\$[^$\n]{1,200}\$|\\[a-zA-Z]+(?:\{[^{}]*\})?')
+
+# Chunk break separators in priority order, each matched at every (overlapping) offset
+_BREAK_SEPARATORS = [
+    ('\n\n', re.compile(r'(?=\n\n)')),  # Paragraph break
+    ('\n', re.compile(r'\n')),  # Line break
+    ('. ', re.compile(r'(?=\. )')),  # Sentence end
+    ('! ', re.compile(r'(?=! )')),  # Exclamation
+    ('? ', re.compile(r'(?=\? )')),  # Question
+]
+
+# Chunk count thresholds for the processing complexity label
+_COMPLEXITY_LEVELS = ((3, 'low'), (8, 'medium'), (float('inf'), 'high'))
+
+# Collapses punctuation and whitespace when comparing quiz questions
+_QUESTION_NORM_RE = re.compile(r'\W+')
+
+# OCR cleanup for mathematical text. The substitutions run in sequence
+# because each one sees the previous pass's output (e.g. operator spacing
+# decides which digit pairs are still left for fraction normalization)
+_MATH_SYMBOL_TABLE = str.maketrans({'×': '*', '÷': '/'})
+_OCR_O_RE = re.compile(r'(\d)\s*[oO]\s*(\d)')
+_OCR_IL_RE = re.compile(r'([Il])\s*(\d)')
+_OP_SPACE_RE = re.compile(r'(\d)\s*([+\-*/=])\s*(\d)')
+_FRAC_RE = re.compile(r'(\d+)/(\d+)')
+
+def _enclosing_expression(starts: List[int], ends: List[int], pos: int) -> Optional[Tuple[int, int]]:
+    """Find the math expression interval that strictly contains pos, if any"""
+    idx = bisect_left(starts, pos) - 1  # Latest expression starting before pos
+    if idx >= 0 and ends[idx] > pos:
+        return starts[idx], ends[idx]
+    return None
+
+
 class DocumentChunk:
     """Represents a chunk of document text"""
     def __init__(self, 
@@ -30,45 +102,58 @@ class DocumentChunk:
         self.overlap_size = overlap_size
         self.word_count = len(content.split())
         self.character_count = len(content)
-        self.has_math = self._detect_math_content()
-        self.has_chemical = self._detect_chemical_content()
-        self.has_supersub = self._detect_supersub_content()
-        
-    def _detect_math_content(self) -> bool:
+    
+    @cached_property
+    def has_math(self) -> bool:
         """Detect mathematical content in chunk"""
-        math_patterns = [
-            r'\$[^$]+\$',  # LaTeX inline math
-            r'\$\$[^$]+\$\$',  # LaTeX block math
-            r'[a-zA-Z0-9\s]*=\s*[a-zA-Z0-9\s+\-*/()^]+',  # Simple equations
-            r'\\[a-zA-Z]+',  # LaTeX commands
-            r'[∑∫π√∞±≈≠≤≥αβγδθλμσφψω]',  # Mathematical symbols
-        ]
-        return any(re.search(pattern, self.content, re.IGNORECASE) for pattern in math_patterns)
+        return bool(_MATH_RE.search(self.content))
     
-    def _detect_chemical_content(self) -> bool:
+    @cached_property
+    def has_chemical(self) -> bool:
         """Detect chemical formulas in chunk"""
-        chemical_patterns = [
-            r'[A-Z][a-z]?[0-9]*(?:\([A-Z][a-z]?[0-9]*\))*[0-9]*',  # Chemical formulas
-            r'H2O|CO2|NaCl|CH4|O2|N2|Ca\(OH\)2|H2SO4|HCl|NaOH',  # Common chemicals
-        ]
-        return any(re.search(pattern, self.content) for pattern in chemical_patterns)
+        words = {word.strip(_CHEM_TOKEN_STRIP) for word in self.content.split()}
+        if not words.isdisjoint(_CHEM_TOKENS):
+            return True
+        return bool(_STRICT_CHEM_RE.search(self.content))
     
-    def _detect_supersub_content(self) -> bool:
+    @cached_property
+    def has_supersub(self) -> bool:
         """Detect superscript/subscript content in chunk"""
-        supersub_patterns = [
-            r'\^[a-zA-Z0-9]+',  # Superscript
-            r'_[a-zA-Z0-9]+',   # Subscript
-            r'[0-9]+\^[0-9]+',  # Number with superscript
-            r'[a-zA-Z]+_[0-9]+',  # Variable with subscript
-            r'x²|x³|m²|cm³|kg/m³',  # Common superscript/subscript patterns
-        ]
-        return any(re.search(pattern, self.content, re.IGNORECASE) for pattern in supersub_patterns)
+        return bool(_SUPERSUB_RE.search(self.content))
 
 class EnhancedDocumentProcessor:
     """Enhanced document processor with chunking support"""
     
     def __init__(self, workflow: StudyHelperWorkflow):
         self.workflow = workflow
+        # Generated outputs keyed by chunk content, so repeated chunks
+        # (headers, footers, boilerplate) only reach the LLM once
+        self._chunk_cache: LRUCache = LRUCache(maxsize=256)
+        # Per-key lock and the number of tasks using it; dropped when unused
+        self._chunk_locks: Dict[bytes, List[Any]] = {}
+    
+    @asynccontextmanager
+    async def _chunk_lock(self, key: bytes) -> AsyncIterator[None]:
+        """Serialize work on one chunk key, removing the lock once nobody holds or waits on it"""
+        entry = self._chunk_locks.get(key)
+        if entry is None:
+            entry = self._chunk_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chunk_locks[key]
+    
+    @staticmethod
+    def _chunk_cache_key(chunk: DocumentChunk, state: ImageProcessingState) -> bytes:
+        """Key a chunk by its content and the content type used in the prompts"""
+        content_type = state.content_type.value if state.content_type else ""
+        return hashlib.blake2b(
+            f"{content_type}\0{chunk.content}".encode("utf-8"), digest_size=16
+        ).digest()
         
     def create_chunks(self, 
                      text: str, 
@@ -78,46 +163,71 @@ class EnhancedDocumentProcessor:
         """
         Split text into manageable chunks while preserving context
         """
+        return list(self.iter_chunks(text, chunk_size, overlap_size, preserve_math))
+    
+    def iter_chunks(self, 
+                    text: str, 
+                    chunk_size: int = 4000, 
+                    overlap_size: int = 200,
+                    preserve_math: bool = True) -> Iterator[DocumentChunk]:
+        """
+        Yield chunks one at a time, so only the chunks being processed are held in memory
+        """
         if len(text) <= chunk_size:
-            return [DocumentChunk("chunk_0", text, 0, len(text))]
+            yield DocumentChunk("chunk_0", text, 0, len(text))
+            return
         
-        chunks = []
         start_index = 0
         chunk_index = 0
+        min_chunk_size = chunk_size * 0.7
+        
+        # Index every break position once instead of rescanning each window
+        break_tables = [
+            (len(sep), [m.start() for m in pattern.finditer(text)])
+            for sep, pattern in _BREAK_SEPARATORS
+        ]
+        
+        # Intervals of math expressions, so boundaries can be moved off them
+        expr_starts: List[int] = []
+        expr_ends: List[int] = []
+        if preserve_math:
+            for match in _MATH_EXPR_RE.finditer(text):
+                expr_starts.append(match.start())
+                expr_ends.append(match.end())
         
         while start_index < len(text):
             end_index = min(start_index + chunk_size, len(text))
             
             # Find a good breaking point
             if end_index < len(text):
-                break_points = [
-                    text.rfind('\n\n', start_index, end_index),  # Paragraph break
-                    text.rfind('\n', start_index, end_index),    # Line break
-                    text.rfind('. ', start_index, end_index),    # Sentence end
-                    text.rfind('! ', start_index, end_index),    # Exclamation
-                    text.rfind('? ', start_index, end_index),    # Question
-                ]
-                
-                # Find the best break point that's not too close to the start
-                min_chunk_size = chunk_size * 0.7
+                # Take the last break of the highest priority kind that
+                # fits in the window and is not too close to the start
                 best_break = None
-                for bp in break_points:
-                    if bp > start_index + min_chunk_size:
-                        best_break = bp + 1
+                for sep_len, positions in break_tables:
+                    idx = bisect_right(positions, end_index - sep_len) - 1
+                    if idx >= 0 and positions[idx] > start_index + min_chunk_size:
+                        best_break = positions[idx] + 1
                         break
                 
                 if best_break:
                     end_index = best_break
+                
+                # Extend the chunk past a math expression the break would split
+                expr = _enclosing_expression(expr_starts, expr_ends, end_index)
+                if expr:
+                    end_index = expr[1]
             
             # Extract chunk content with overlap
             chunk_start = max(0, start_index - (overlap_size if chunk_index > 0 else 0))
-            chunk_content = text[chunk_start:end_index]
             
-            # Preserve mathematical expressions at chunk boundaries
-            if preserve_math and chunk_index > 0:
-                chunk_content = self._preserve_math_at_boundary(chunk_content, text, chunk_start)
+            # Start the overlap before a math expression rather than inside it
+            expr = _enclosing_expression(expr_starts, expr_ends, chunk_start)
+            if expr:
+                chunk_start = expr[0]
+            
+            chunk_content = text[chunk_start:end_index]
             
-            chunk = DocumentChunk(
+            yield DocumentChunk(
                 chunk_id=f"chunk_{chunk_index}",
                 content=chunk_content,
                 start_index=chunk_start,
@@ -125,111 +235,122 @@ class EnhancedDocumentProcessor:
                 overlap_size=overlap_size if chunk_index > 0 else 0
             )
             
-            chunks.append(chunk)
             start_index = end_index
             chunk_index += 1
-        
-        return chunks
-    
-    def _preserve_math_at_boundary(self, chunk_content: str, full_text: str, start_pos: int) -> str:
-        """Ensure mathematical expressions aren't split across chunks"""
-        # Check for incomplete mathematical expressions at the beginning
-        math_patterns = [
-            r'\$[^$]*$',  # Incomplete LaTeX math
-            r'\\[a-zA-Z]*$',  # Incomplete LaTeX command
-        ]
-        
-        for pattern in math_patterns:
-            if re.search(pattern, chunk_content[:100]):  # Check first 100 chars
-                # Find the complete expression in the full text
-                complete_match = re.search(r'\$[^$]+\$|\\[a-zA-Z]+', full_text[start_pos-50:start_pos+200])
-                if complete_match:
-                    # Adjust chunk to include complete expression
-                    chunk_content = complete_match.group(0) + chunk_content[complete_match.end():]
-        
-        return chunk_content
     
     async def process_chunks_parallel(self, 
-                                    chunks: List[DocumentChunk],
+                                    chunks: Iterable[DocumentChunk],
                                     original_state: ImageProcessingState,
                                     max_concurrency: int = 3,
                                     progress_callback: Optional[callable] = None) -> List[Dict[str, Any]]:
         """
         Process chunks in parallel with rate limiting
+        
+        Chunks are pulled from the iterable only as workers free up, so a
+        generator from iter_chunks is never materialized in full. The
+        progress total is None when the iterable has no length.
         """
-        semaphore = asyncio.Semaphore(max_concurrency)
-        results = []
-        
-        async def process_single_chunk(chunk: DocumentChunk, index: int) -> Dict[str, Any]:
-            async with semaphore:
-                try:
-                    # Create a new state for this chunk
-                    chunk_state = ImageProcessingState(
-                        image_path=original_state.image_path,
-                        user_id=original_state.user_id,
-                        extracted_text=chunk.content,
-                        quality_score=original_state.quality_score,
-                        quality_classification=original_state.quality_classification,
-                        content_type=original_state.content_type,
-                        content_confidence=original_state.content_confidence,
-                    )
-                    
-                    # Process chunk through workflow nodes
-                    summary_result = await self._process_chunk_summary(chunk_state, chunk)
-                    explanation_result = await self._process_chunk_explanation(chunk_state, chunk)
-                    quiz_result = await self._process_chunk_quiz(chunk_state, chunk)
-                    
-                    # Report progress
-                    if progress_callback:
-                        progress_callback(index + 1, len(chunks))
+        total = len(chunks) if isinstance(chunks, Sized) else None
+        # Paces chunk starts to the same rate the old fixed batches allowed
+        rate_limiter = AsyncLimiter(max_concurrency, 1.0)
+        
+        async def process_single_chunk(chunk: DocumentChunk, index: int, key: bytes) -> Dict[str, Any]:
+            # Duplicate chunks wait on the first one and reuse its outputs
+            async with self._chunk_lock(key):
+                outputs = self._chunk_cache.get(key)
+                if outputs is not None:
+                    outputs = copy.deepcopy(outputs)
+                else:
+                    async with rate_limiter:
+                        try:
+                            # Create a new state for this chunk
+                            chunk_state = ImageProcessingState(
+                                image_path=original_state.image_path,
+                                user_id=original_state.user_id,
+                                extracted_text=chunk.content,
+                                quality_score=original_state.quality_score,
+                                quality_classification=original_state.quality_classification,
+                                content_type=original_state.content_type,
+                                content_confidence=original_state.content_confidence,
+                            )
+                            
+                            # Process chunk through workflow nodes; the explanation and
+                            # quiz prompts both read the summary, then run side by side
+                            summary_result = await self._process_chunk_summary(chunk_state, chunk)
+                            explanation_result, quiz_result = await asyncio.gather(
+                                self._process_chunk_explanation(chunk_state, chunk),
+                                self._process_chunk_quiz(chunk_state, chunk)
+                            )
+                            
+                        except Exception as e:
+                            logger.error(f"Error processing chunk {chunk.chunk_id}: {e}")
+                            return {
+                                'chunk_id': chunk.chunk_id,
+                                'error': str(e),
+                                'has_math': chunk.has_math,
+                                'has_chemical': chunk.has_chemical,
+                                'has_supersub': chunk.has_supersub,
+                            }
                     
-                    return {
-                        'chunk_id': chunk.chunk_id,
+                    outputs = {
                         'summary': summary_result,
                         'explanation': explanation_result,
                         'quiz': quiz_result,
-                        'has_math': chunk.has_math,
-                        'has_chemical': chunk.has_chemical,
-                        'has_supersub': chunk.has_supersub,
-                        'word_count': chunk.word_count,
-                        'character_count': chunk.character_count,
                     }
-                    
-                except Exception as e:
-                    logger.error(f"Error processing chunk {chunk.chunk_id}: {e}")
-                    return {
-                        'chunk_id': chunk.chunk_id,
-                        'error': str(e),
-                        'has_math': chunk.has_math,
-                        'has_chemical': chunk.has_chemical,
-                        'has_supersub': chunk.has_supersub,
-                    }
-        
-        # Process chunks in batches
-        for i in range(0, len(chunks), max_concurrency):
-            batch = chunks[i:i + max_concurrency]
-            batch_tasks = [
-                process_single_chunk(chunk, i + j) 
-                for j, chunk in enumerate(batch)
-            ]
+                    # Fallback text from a failed step is not reused for later requests
+                    if not chunk_state.generation_failures:
+                        self._chunk_cache[key] = outputs
             
-            batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-            results.extend(batch_results)
+            # Report progress
+            if progress_callback:
+                progress_callback(index + 1, total)
             
-            # Add delay between batches to respect rate limits
-            if i + max_concurrency < len(chunks):
-                await asyncio.sleep(1)
+            return {
+                'chunk_id': chunk.chunk_id,
+                **outputs,
+                'has_math': chunk.has_math,
+                'has_chemical': chunk.has_chemical,
+                'has_supersub': chunk.has_supersub,
+                'word_count': chunk.word_count,
+                'character_count': chunk.character_count,
+            }
+        
+        results: Dict[int, Any] = {}
+        pending = enumerate(chunks)
+        deferred: List[asyncio.Task] = []
+        
+        async def run(chunk: DocumentChunk, index: int, key: bytes) -> None:
+            try:
+                results[index] = await process_single_chunk(chunk, index, key)
+            except Exception as e:
+                results[index] = e
+        
+        async def worker() -> None:
+            # A finished chunk frees its worker for the next one immediately
+            for index, chunk in pending:
+                key = self._chunk_cache_key(chunk, original_state)
+                if key in self._chunk_locks:
+                    # A duplicate is already in flight; wait for it outside
+                    # the worker pool so this worker moves on
+                    deferred.append(asyncio.create_task(run(chunk, index, key)))
+                else:
+                    await run(chunk, index, key)
         
-        return results
+        await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+        await asyncio.gather(*deferred)
+        return [results[i] for i in range(len(results))]
     
     async def _process_chunk_summary(self, state: ImageProcessingState, chunk: DocumentChunk) -> str:
         """Process summary for a single chunk"""
         try:
             # Use the existing summary generation method
             summary_state = await self.workflow.generate_summary_node(state)
+            if not summary_state.summary:
+                state.generation_failures.append("summary")
             return summary_state.summary or f"Summary for {chunk.chunk_id}"
         except Exception as e:
             logger.error(f"Error generating summary for {chunk.chunk_id}: {e}")
+            state.generation_failures.append("summary")
             return f"Summary generation failed for {chunk.chunk_id}: {str(e)}"
     
     async def _process_chunk_explanation(self, state: ImageProcessingState, chunk: DocumentChunk) -> str:
@@ -237,9 +358,12 @@ class EnhancedDocumentProcessor:
         try:
             # Use the existing explanation generation method
             explanation_state = await self.workflow.generate_explanation_node(state)
+            if not explanation_state.explanation:
+                state.generation_failures.append("explanation")
             return explanation_state.explanation or f"Explanation for {chunk.chunk_id}"
         except Exception as e:
             logger.error(f"Error generating explanation for {chunk.chunk_id}: {e}")
+            state.generation_failures.append("explanation")
             return f"Explanation generation failed for {chunk.chunk_id}: {str(e)}"
     
     async def _process_chunk_quiz(self, state: ImageProcessingState, chunk: DocumentChunk) -> List[Dict[str, Any]]:
@@ -250,13 +374,18 @@ class EnhancedDocumentProcessor:
             return quiz_state.quiz_questions[:3]  # Limit to 3 questions per chunk
         except Exception as e:
             logger.error(f"Error generating quiz for {chunk.chunk_id}: {e}")
+            state.generation_failures.append("quiz")
             return []
     
     def merge_chunk_results(self, 
                           chunks: List[DocumentChunk], 
-                          chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+                          chunk_results: List[Dict[str, Any]],
+                          include_chunk_results: bool = False) -> Dict[str, Any]:
         """
         Merge results from all chunks into a cohesive response
+        
+        The raw per-chunk results duplicate the merged fields and are large,
+        so they are only attached to the metadata when requested for debugging.
         """
         successful_results = [r for r in chunk_results if 'error' not in r]
         
@@ -287,6 +416,10 @@ class EnhancedDocumentProcessor:
         chemical_chunks = sum(1 for r in chunk_results if r.get('has_chemical', False))
         supersub_chunks = sum(1 for r in chunk_results if r.get('has_supersub', False))
         
+        processing_metadata = {'chunked_processing': True}
+        if include_chunk_results:
+            processing_metadata['chunk_results'] = chunk_results
+        
         return {
             'merged_summary': merged_summary,
             'merged_explanation': merged_explanation,
@@ -299,10 +432,7 @@ class EnhancedDocumentProcessor:
                 'chemical_chunks': chemical_chunks,
                 'supersub_chunks': supersub_chunks,
             },
-            'processing_metadata': {
-                'chunked_processing': True,
-                'chunk_results': chunk_results,
-            }
+            'processing_metadata': processing_metadata
         }
     
     def _merge_summaries(self, summaries: List[str]) -> str:
@@ -342,9 +472,13 @@ class EnhancedDocumentProcessor:
         
         for question in questions:
             if isinstance(question, dict):
-                question_text = question.get('question', '').strip().lower()
-                if question_text and question_text not in seen_questions:
-                    seen_questions.add(question_text)
+                # Ignore case, punctuation and spacing differences
+                question_text = _QUESTION_NORM_RE.sub(' ', question.get('question', '')).strip().lower()
+                if not question_text:
+                    continue
+                key = hashlib.blake2b(question_text.encode('utf-8'), digest_size=16).digest()
+                if key not in seen_questions:
+                    seen_questions.add(key)
                     unique_questions.append(question)
         
         return unique_questions
@@ -356,27 +490,20 @@ class EnhancedDocumentProcessor:
         """
         Estimate processing time for chunked processing
         """
-        chunks_needed = max(1, math.ceil(text_length / chunk_size))
+        # Integer ceiling division, no float round trip
+        chunks_needed = max(1, (text_length + chunk_size - 1) // chunk_size)
         
         # Base processing time per chunk (seconds)
         base_time_per_chunk = 5.0
         
-        # Complexity factors
-        complexity_multiplier = 1.0
-        if text_length > 10000:
-            complexity_multiplier = 1.5
-        if text_length > 20000:
-            complexity_multiplier = 2.0
+        # Complexity factors: +0.5 past 10k characters and again past 20k
+        complexity_multiplier = 1.0 + 0.5 * (text_length > 10000) + 0.5 * (text_length > 20000)
         
         # Calculate total time considering concurrency
         total_sequential_time = chunks_needed * base_time_per_chunk * complexity_multiplier
         estimated_time = total_sequential_time / max_concurrency
         
-        complexity = 'low'
-        if chunks_needed > 3:
-            complexity = 'medium'
-        if chunks_needed > 8:
-            complexity = 'high'
+        complexity = next(label for limit, label in _COMPLEXITY_LEVELS if chunks_needed <= limit)
         
         return {
             'estimated_time_seconds': round(estimated_time),
@@ -385,21 +512,28 @@ class EnhancedDocumentProcessor:
             'recommend_chunking': chunks_needed > 1,
         }
 
+
+@lru_cache(maxsize=1)
+def get_enhanced_processor() -> EnhancedDocumentProcessor:
+    """Get the shared processor, so its chunk cache outlives a single request"""
+    return EnhancedDocumentProcessor(get_workflow())
+
+
 def preprocess_text_for_math(text: str) -> str:
     """
     Preprocess text to better handle mathematical content
     """
-    # Normalize mathematical symbols
-    text = text.replace('×', '*').replace('÷', '/')
+    # Normalize mathematical symbols in a single pass
+    text = text.translate(_MATH_SYMBOL_TABLE)
     
     # Fix common OCR errors in mathematical contexts
-    text = re.sub(r'(\d)\s*[oO]\s*(\d)', r'\1 0 \2', text)  # Fix 'o' as zero
-    text = re.sub(r'([Il])\s*(\d)', r'1 \2', text)  # Fix 'I' or 'l' as 1
+    text = _OCR_O_RE.sub(r'\1 0 \2', text)  # Fix 'o' as zero
+    text = _OCR_IL_RE.sub(r'1 \2', text)  # Fix 'I' or 'l' as 1
     
     # Preserve spacing around mathematical operators
-    text = re.sub(r'(\d)\s*([+\-*/=])\s*(\d)', r'\1 \2 \3', text)
+    text = _OP_SPACE_RE.sub(r'\1 \2 \3', text)
     
     # Normalize fractions
-    text = re.sub(r'(\d+)/(\d+)', r'\\frac{\1}{\2}', text)
+    text = _FRAC_RE.sub(r'\\frac{\1}{\2}', text)
     
     return text
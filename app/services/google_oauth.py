@@ -3,17 +3,72 @@ Google OAuth Service
 Google OAuth 2.0 integration for user authentication
 """
 from typing import Dict, Any, Optional
+import asyncio
+import hashlib
 import json
+import threading
+import time
+from urllib.parse import urlencode
 import httpx
+from cachetools import TTLCache
 from fastapi import HTTPException, status
+from google.auth import jwt as google_jwt
+from google.auth.exceptions import TransportError
 from google.auth.transport import requests
-from google.oauth2 import id_token
 import logging
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# How long verified ID token claims are reused before verifying again
+ID_TOKEN_CACHE_TTL_SECONDS = 30
+
+# Verified ID token claims keyed by token digest, shared by every service
+# instance; failures are never cached
+_id_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=ID_TOKEN_CACHE_TTL_SECONDS)
+_id_token_lock = threading.Lock()
+
+# Google's signing certificates rotate rarely, so they are refetched every few
+# minutes or when a token names a key id that is not cached yet; unknown key
+# ids trigger at most one refetch per interval so forged tokens cannot force
+# a fetch on every request
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_CERTS_TTL_SECONDS = 300
+GOOGLE_CERTS_MIN_REFETCH_SECONDS = 60
+
+# Outbound calls to Google share pooled keep-alive connections
+GOOGLE_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+GOOGLE_HTTP_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+
+# Certificate map shared by every service instance; one requests session is
+# reused for the fetches
+_certs_request = requests.Request()
+_certs: Dict[str, str] = {}
+_certs_expire_at = 0.0
+_certs_fetched_at = float("-inf")
+_certs_lock = threading.Lock()
+
+
+def _get_google_certs(kid: Optional[str] = None) -> Dict[str, str]:
+    """Get Google's signing certificates, fetching them when stale or missing kid"""
+    global _certs, _certs_expire_at, _certs_fetched_at
+    with _certs_lock:
+        now = time.monotonic()
+        unknown_kid = (
+            kid is not None
+            and kid not in _certs
+            and now - _certs_fetched_at >= GOOGLE_CERTS_MIN_REFETCH_SECONDS
+        )
+        if now >= _certs_expire_at or unknown_kid:
+            response = _certs_request(GOOGLE_CERTS_URL, method="GET")
+            if response.status != 200:
+                raise TransportError(f"Could not fetch certificates at {GOOGLE_CERTS_URL}")
+            _certs = json.loads(response.data.decode("utf-8"))
+            _certs_fetched_at = now
+            _certs_expire_at = now + GOOGLE_CERTS_TTL_SECONDS
+        return _certs
+
 
 class GoogleOAuthService:
     """Google OAuth service for handling Google Sign-In"""
@@ -32,6 +87,34 @@ class GoogleOAuthService:
         self.token_url = "https://oauth2.googleapis.com/token"
         self.userinfo_url = "https://www.googleapis.com/oauth2/v2/userinfo"
         self.auth_url = "https://accounts.google.com/o/oauth2/v2/auth"
+        
+        # Authorization URL query parameters that never change between requests
+        self._base_auth_params = {
+            "client_id": self.client_id,
+            "redirect_uri": self.redirect_uri,
+            "scope": "openid email profile",
+            "response_type": "code",
+            "access_type": "offline",
+            "include_granted_scopes": "true"
+        }
+        
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use and closed on shutdown"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                limits=GOOGLE_HTTP_LIMITS,
+                timeout=GOOGLE_HTTP_TIMEOUT
+            )
+        return self._http_client
+    
+    async def aclose(self) -> None:
+        """Close pooled connections to Google"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
     def get_authorization_url(self, state: Optional[str] = None) -> str:
         """Generate Google OAuth authorization URL"""
@@ -45,21 +128,10 @@ class GoogleOAuthService:
                 detail="Google OAuth not configured"
             )
         
-        params = {
-            "client_id": self.client_id,
-            "redirect_uri": self.redirect_uri,
-            "scope": "openid email profile",
-            "response_type": "code",
-            "access_type": "offline",
-            "include_granted_scopes": "true"
-        }
-        
-        if state:
-            params["state"] = state
+        params = {**self._base_auth_params, "state": state} if state else self._base_auth_params
         
-        # Build URL with parameters
-        param_string = "&".join([f"{k}={v}" for k, v in params.items()])
-        return f"{self.auth_url}?{param_string}"
+        # Build URL with properly encoded parameters
+        return f"{self.auth_url}?{urlencode(params)}"
     
     async def exchange_code_for_tokens(self, code: str) -> Dict[str, Any]:
         """Exchange authorization code for access tokens"""
@@ -79,20 +151,19 @@ class GoogleOAuthService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(self.token_url, data=data)
-                response.raise_for_status()
-                
-                token_data = response.json()
-                
-                if "error" in token_data:
-                    logger.error(f"Google OAuth token exchange error: {token_data}")
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Google OAuth error: {token_data.get('error_description', 'Unknown error')}"
-                    )
-                
-                return token_data
+            response = await self.http_client.post(self.token_url, data=data)
+            response.raise_for_status()
+            
+            token_data = response.json()
+            
+            if "error" in token_data:
+                logger.error(f"Google OAuth token exchange error: {token_data}")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Google OAuth error: {token_data.get('error_description', 'Unknown error')}"
+                )
+            
+            return token_data
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error during Google OAuth token exchange: {e}")
@@ -115,12 +186,11 @@ class GoogleOAuthService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(self.userinfo_url, headers=headers)
-                response.raise_for_status()
-                
-                user_info = response.json()
-                return user_info
+            response = await self.http_client.get(self.userinfo_url, headers=headers)
+            response.raise_for_status()
+            
+            user_info = response.json()
+            return user_info
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error during Google user info retrieval: {e}")
@@ -144,18 +214,28 @@ class GoogleOAuthService:
                 detail="Google OAuth not configured"
             )
         
+        cache_key = hashlib.sha256(id_token_string.encode()).digest()
+        with _id_token_lock:
+            cached = _id_token_cache.get(cache_key)
+        # Never serve claims past the token's own expiry
+        if cached is not None and cached['exp'] > time.time():
+            return cached
+        
         try:
-            # Verify the token
-            id_info = id_token.verify_oauth2_token(
-                id_token_string, 
-                requests.Request(), 
-                self.client_id
+            # Verify the token against the cached certificates
+            kid = google_jwt.decode_header(id_token_string).get("kid")
+            id_info = google_jwt.decode(
+                id_token_string,
+                certs=_get_google_certs(kid),
+                audience=self.client_id
             )
             
             # Check issuer
             if id_info['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
                 raise ValueError('Wrong issuer.')
             
+            with _id_token_lock:
+                _id_token_cache[cache_key] = id_info
             return id_info
             
         except ValueError as e:
@@ -187,8 +267,8 @@ class GoogleOAuthService:
                 detail="Missing required tokens from Google"
             )
         
-        # Verify ID token and get user info
-        id_info = self.verify_id_token(id_token_string)
+        # Verify ID token off the event loop; a certificate refetch blocks
+        id_info = await asyncio.to_thread(self.verify_id_token, id_token_string)
         
         # Extract user information
         user_data = {
@@ -3,19 +3,23 @@ AI Study Helper Service
 Service layer for handling AI-powered study assistance
 """
 import asyncio
+import glob
 import os
+import re
 import uuid
 import logging
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from fastapi import UploadFile, HTTPException, status
 from sqlalchemy.orm import Session
-import shutil
+from cachetools import LRUCache
 
 from app.agent.workflow import get_workflow
-from app.services.enhanced_document_processor import EnhancedDocumentProcessor, preprocess_text_for_math
+from app.services.enhanced_document_processor import get_enhanced_processor, preprocess_text_for_math
 from app.agent.schemas import (
     ImageProcessingState,
+    ImageQuality,
+    ContentType,
     StudySessionRequest,
     StudySessionResponse,
     ProcessingResult,
@@ -33,14 +37,65 @@ from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
+# Sentence boundaries and the words that mark a sentence as a key point
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_KEY_POINT_RE = re.compile(r'\b(?:important|key|main|primary|essential|crucial)\b', re.IGNORECASE)
+
+# Capitalized terms that might name concepts in an explanation
+_CAPITALIZED_TERM_RE = re.compile(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b')
+_CONCEPT_STOPWORDS = frozenset({'the', 'and', 'for', 'this', 'that'})
+
+# Upload extensions accepted by the service, lowercased for lookup
+_ALLOWED_EXTENSIONS = frozenset(ext.lower() for ext in settings.ALLOWED_FILE_TYPES)
+
+# Read/write size when saving uploads
+UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024
+
+# Chunked sessions one user may run at once, so a single user cannot
+# use up the shared LLM quota
+MAX_CHUNKED_SESSIONS_PER_USER = 2
+
+
+def _file_too_large() -> HTTPException:
+    """Build the error raised for uploads over MAX_FILE_SIZE"""
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
+    )
+
+
+def _write_upload(file_obj, file_path: str) -> None:
+    """
+    Copy an uploaded file to disk in 1 MiB blocks
+    
+    The size is counted while copying, since UploadFile.size is not always
+    known; the partial file is removed as soon as the limit is exceeded.
+    """
+    total = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            while block := file_obj.read(UPLOAD_COPY_BUFFER_SIZE):
+                total += len(block)
+                if total > settings.MAX_FILE_SIZE:
+                    raise _file_too_large()
+                buffer.write(block)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+        raise
+
 
 class StudyHelperService:
     """Service for AI-powered study assistance"""
     
+    # Shared by every service instance, since one is built per request
+    _user_semaphores: LRUCache = LRUCache(maxsize=10_000)
+    
     def __init__(self, db: Session):
         self.db = db
+        # Workflow and processor are process-wide; only the session is per request
         self.workflow = get_workflow()
-        self.enhanced_processor = EnhancedDocumentProcessor(self.workflow)
+        self.enhanced_processor = get_enhanced_processor()
         self.upload_dir = "uploads/study_images"
         self._ensure_upload_directory()
     
@@ -79,10 +134,10 @@ class StudyHelperService:
         
         try:
             # Validate file
-            await self._validate_upload_file(image_file)
+            file_ext = await self._validate_upload_file(image_file)
             
             # Save uploaded file
-            file_path = await self._save_uploaded_file(image_file, session_id)
+            file_path = await self._save_uploaded_file(image_file, session_id, file_ext)
             
             # Process image through workflow
             processing_state = await self.workflow.process_image(
@@ -100,11 +155,10 @@ class StudyHelperService:
             )
             
             # Create response
-            response = StudySessionResponse(
+            response = self._build_study_session_response(
                 session_id=session_id,
-                user_id=str(user.id),
+                user_id=user.id,
                 result=result,
-                created_at=datetime.utcnow().isoformat(),
                 status="completed" if result.success else "failed"
             )
             
@@ -115,36 +169,15 @@ class StudyHelperService:
             logger.error(f"Study session failed: {session_id}, error: {e}")
             
             # Return error response
-            error_result = ProcessingResult(
-                success=False,
-                processing_time_seconds=0.0,
-                error_message=str(e),
-                image_quality=QualityAssessmentResult(
-                    score=0.0,
-                    classification="low",
-                    issues=["Processing failed"]
-                ),
-                content_type=ContentTypeResult(
-                    content_type="mixed",
-                    confidence=0.0
-                ),
-                text_extraction=TextExtractionResult(
-                    text="",
-                    confidence=0.0,
-                    tool_used=ProcessingTool.NONE
-                )
-            )
-            
-            return StudySessionResponse(
+            return self._build_study_session_response(
                 session_id=session_id,
-                user_id=str(user.id),
-                result=error_result,
-                created_at=datetime.utcnow().isoformat(),
+                user_id=user.id,
+                result=self._build_error_result(str(e)),
                 status="failed"
             )
     
-    async def _validate_upload_file(self, file: UploadFile):
-        """Validate uploaded file"""
+    async def _validate_upload_file(self, file: UploadFile) -> str:
+        """Validate uploaded file and return its lowercased extension"""
         # Check file extension
         if not file.filename:
             raise HTTPException(
@@ -153,34 +186,34 @@ class StudyHelperService:
             )
         
         file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in settings.ALLOWED_FILE_TYPES:
+        if file_ext not in _ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Unsupported file type: {file_ext}. Allowed types: {settings.ALLOWED_FILE_TYPES}"
             )
         
-        # Check file size
+        # Check file size when the client declared it; _write_upload
+        # enforces the limit on the bytes actually received
         if file.size and file.size > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
-            )
+            raise _file_too_large()
+        
+        return file_ext
     
-    async def _save_uploaded_file(self, file: UploadFile, session_id: str) -> str:
-        """Save uploaded file and return path"""
+    async def _save_uploaded_file(self, file: UploadFile, session_id: str, file_ext: str) -> str:
+        """Save uploaded file under its validated extension and return path"""
         try:
             # Generate unique filename
-            file_ext = os.path.splitext(file.filename)[1]
             filename = f"{session_id}_{uuid.uuid4().hex[:8]}{file_ext}"
             file_path = os.path.join(self.upload_dir, filename)
             
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            # Save file off the event loop so other requests keep running
+            await asyncio.to_thread(_write_upload, file.file, file_path)
             
             logger.info(f"File saved: {file_path}")
             return file_path
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to save uploaded file: {e}")
             raise HTTPException(
@@ -196,10 +229,17 @@ class StudyHelperService:
         include_quiz: bool,
         quiz_count: int
     ) -> ProcessingResult:
-        """Build processing result from workflow state"""
+        """
+        Build processing result from workflow state
+        
+        Everything here comes from our own state, so the models are built
+        with model_construct and skip validation; FastAPI validates the
+        response once at the boundary. Quiz questions come straight from
+        the LLM and are still validated.
+        """
         
         # Determine success
-        success = (
+        success = bool(
             state.should_proceed and 
             not state.error_message and
             state.extracted_text and
@@ -207,16 +247,16 @@ class StudyHelperService:
         )
         
         # Build quality assessment result
-        quality_result = QualityAssessmentResult(
+        quality_result = QualityAssessmentResult.model_construct(
             score=state.quality_score or 0.0,
-            classification=state.quality_classification or "low",
+            classification=state.quality_classification or ImageQuality.LOW,
             issues=state.quality_issues or [],
             recommendations=self._generate_quality_recommendations(state)
         )
         
         # Build content type result
-        content_result = ContentTypeResult(
-            content_type=state.content_type or "mixed",
+        content_result = ContentTypeResult.model_construct(
+            content_type=state.content_type or ContentType.MIXED,
             confidence=state.content_confidence or 0.0,
             details={
                 "processing_tool": state.processing_tool_used,
@@ -225,7 +265,7 @@ class StudyHelperService:
         )
         
         # Build text extraction result
-        text_result = TextExtractionResult(
+        text_result = TextExtractionResult.model_construct(
             text=state.extracted_text or "",
             confidence=state.extraction_confidence or 0.0,
             tool_used=state.processing_tool_used or ProcessingTool.NONE
@@ -234,7 +274,7 @@ class StudyHelperService:
         # Build optional results
         summary_result = None
         if include_summary and state.summary:
-            summary_result = SummaryResult(
+            summary_result = SummaryResult.model_construct(
                 summary=state.summary,
                 key_points=self._extract_key_points(state.summary),
                 word_count=len(state.summary.split()),
@@ -243,7 +283,7 @@ class StudyHelperService:
         
         explanation_result = None
         if include_explanation and state.explanation:
-            explanation_result = ExplanationResult(
+            explanation_result = ExplanationResult.model_construct(
                 explanation=state.explanation,
                 concepts_explained=self._extract_concepts(state.explanation),
                 difficulty_level="intermediate",
@@ -252,8 +292,11 @@ class StudyHelperService:
         
         quiz_result = None
         if include_quiz and state.quiz_questions:
-            quiz_questions = [
-                QuizQuestion(
+            # Build the questions and collect their topics in one pass
+            quiz_questions = []
+            topics = set()
+            for q in state.quiz_questions[:quiz_count]:
+                quiz_question = QuizQuestion(
                     question=q.get("question", ""),
                     question_type=q.get("question_type", "multiple_choice"),
                     options=q.get("options", []),
@@ -262,14 +305,15 @@ class StudyHelperService:
                     difficulty=q.get("difficulty", "medium"),
                     topic=q.get("topic", "General")
                 )
-                for q in state.quiz_questions[:quiz_count]
-            ]
+                quiz_questions.append(quiz_question)
+                if quiz_question.topic:
+                    topics.add(quiz_question.topic)
             
-            quiz_result = QuizResult(
+            quiz_result = QuizResult.model_construct(
                 questions=quiz_questions,
                 total_questions=len(quiz_questions),
                 estimated_time_minutes=len(quiz_questions) * 2,  # 2 minutes per question
-                topics_covered=list(set(q.topic for q in quiz_questions if q.topic))
+                topics_covered=list(topics)
             )
         
         # Collect warnings
@@ -281,7 +325,7 @@ class StudyHelperService:
         if state.needs_preprocessing:
             warnings.append("Image required preprocessing")
         
-        return ProcessingResult(
+        return ProcessingResult.model_construct(
             success=success,
             processing_time_seconds=state.processing_time or 0.0,
             summary=summary_result,
@@ -294,6 +338,44 @@ class StudyHelperService:
             warnings=warnings
         )
     
+    def _build_error_result(self, error_message: str) -> ProcessingResult:
+        """Build the result returned when processing fails outright"""
+        return ProcessingResult(
+            success=False,
+            processing_time_seconds=0.0,
+            error_message=error_message,
+            image_quality=QualityAssessmentResult(
+                score=0.0,
+                classification="low",
+                issues=["Processing failed"]
+            ),
+            content_type=ContentTypeResult(
+                content_type="mixed",
+                confidence=0.0
+            ),
+            text_extraction=TextExtractionResult(
+                text="",
+                confidence=0.0,
+                tool_used=ProcessingTool.NONE
+            )
+        )
+    
+    def _build_study_session_response(
+        self,
+        session_id: str,
+        user_id: Any,
+        result: ProcessingResult,
+        status: str
+    ) -> StudySessionResponse:
+        """Wrap a processing result in a study session response"""
+        return StudySessionResponse(
+            session_id=session_id,
+            user_id=str(user_id),
+            result=result,
+            created_at=datetime.utcnow(),
+            status=status
+        )
+    
     def _generate_quality_recommendations(self, state: ImageProcessingState) -> List[str]:
         """Generate quality improvement recommendations"""
         recommendations = []
@@ -317,13 +399,12 @@ class StudyHelperService:
     def _extract_key_points(self, summary: str) -> List[str]:
         """Extract key points from summary"""
         # Simple extraction - split by sentences and take important ones
-        sentences = summary.split('. ')
+        sentences = _SENTENCE_SPLIT_RE.split(summary)
         key_points = []
         
         for sentence in sentences:
             sentence = sentence.strip()
-            if len(sentence) > 20 and any(word in sentence.lower() for word in 
-                ['important', 'key', 'main', 'primary', 'essential', 'crucial']):
+            if len(sentence) > 20 and _KEY_POINT_RE.search(sentence):
                 key_points.append(sentence)
         
         # If no key points found, take first few sentences
@@ -334,19 +415,17 @@ class StudyHelperService:
     
     def _extract_concepts(self, explanation: str) -> List[str]:
         """Extract key concepts from explanation"""
-        # Simple concept extraction
-        concepts = []
-        
         # Look for capitalized terms that might be concepts
-        import re
-        capitalized_terms = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', explanation)
+        capitalized_terms = _CAPITALIZED_TERM_RE.findall(explanation)
         
         # Filter and clean
-        for term in capitalized_terms:
-            if len(term) > 3 and term.lower() not in ['the', 'and', 'for', 'this', 'that']:
-                concepts.append(term)
+        concepts = [
+            term for term in capitalized_terms
+            if len(term) > 3 and term.lower() not in _CONCEPT_STOPWORDS
+        ]
         
-        return list(set(concepts))[:10]  # Unique concepts, limit to 10
+        # Unique concepts in order of first appearance, limit to 10
+        return list(dict.fromkeys(concepts))[:10]
     
     async def get_study_session(self, session_id: str, user: User) -> Optional[StudySessionResponse]:
         """Get study session by ID (if stored in database)"""
@@ -365,13 +444,13 @@ class StudyHelperService:
         # This would delete from database and clean up files
         # For now, just try to delete the file
         try:
-            # Find and delete associated file
-            for filename in os.listdir(self.upload_dir):
-                if filename.startswith(session_id):
-                    file_path = os.path.join(self.upload_dir, filename)
-                    os.remove(file_path)
-                    logger.info(f"Deleted file: {file_path}")
-                    return True
+            # Find and delete associated file; uploads are saved as
+            # "<session_id>_<suffix><ext>", so match only that shape
+            pattern = os.path.join(self.upload_dir, f"{glob.escape(session_id)}_*")
+            for file_path in glob.iglob(pattern):
+                os.remove(file_path)
+                logger.info(f"Deleted file: {file_path}")
+                return True
             return False
         except Exception as e:
             logger.error(f"Failed to delete session files: {e}")
@@ -400,14 +479,16 @@ class StudyHelperService:
         logger.info(f"Starting enhanced study session: {session_id}")
         
         try:
-            # Save uploaded file
-            file_path = await self._save_uploaded_file(image_file, session_id)
+            # Validate and save uploaded file
+            file_ext = await self._validate_upload_file(image_file)
+            file_path = await self._save_uploaded_file(image_file, session_id, file_ext)
             
             # Initialize processing state
             initial_state = ImageProcessingState(
                 image_path=file_path,
-                user_id=user.id,
-                start_time=datetime.now().timestamp()
+                user_id=str(user.id),
+                start_time=datetime.now().timestamp(),
+                downscale_image=preprocessing
             )
             
             # Run initial text extraction and quality assessment
@@ -454,31 +535,83 @@ class StudyHelperService:
                 if generate_quiz:
                     state = await self.workflow.generate_quiz_node(state)
                 
-                result = self._build_processing_result(state, chunked=False)
+                result = self._build_processing_result(
+                    state,
+                    generate_summary,
+                    generate_explanation,
+                    generate_quiz,
+                    quiz_question_count
+                )
             
             # Build and return response
             return self._build_study_session_response(
                 session_id=session_id,
                 user_id=user.id,
                 result=result,
-                status="completed"
+                status="completed" if result.success else "failed"
             )
             
         except Exception as e:
             logger.error(f"Enhanced study session {session_id} failed: {e}")
-            error_result = ProcessingResult(
-                success=False,
-                processing_time_seconds=0,
-                error_message=str(e),
-                warnings=[]
-            )
-            
             return self._build_study_session_response(
                 session_id=session_id,
                 user_id=user.id,
-                result=error_result,
+                result=self._build_error_result(str(e)),
                 status="failed"
             )
+    
+    def _user_semaphore(self, user_id: str) -> asyncio.Semaphore:
+        """Get the semaphore bounding one user's concurrent chunked sessions"""
+        semaphore = self._user_semaphores.get(user_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(MAX_CHUNKED_SESSIONS_PER_USER)
+            self._user_semaphores[user_id] = semaphore
+        return semaphore
+    
+    async def _process_with_chunking(
+        self,
+        state: ImageProcessingState,
+        chunk_size: int,
+        max_concurrency: int,
+        preserve_equations: bool,
+        generate_summary: bool,
+        generate_explanation: bool,
+        generate_quiz: bool,
+        quiz_question_count: int
+    ) -> ProcessingResult:
+        """
+        Split the extracted text into chunks and run the AI steps on them
+        
+        process_chunks_parallel already caps the chunks in flight at
+        max_concurrency; the per-user semaphore additionally caps how many
+        chunked sessions one user can have running at once.
+        """
+        chunks = self.enhanced_processor.create_chunks(
+            state.extracted_text,
+            chunk_size=chunk_size,
+            preserve_math=preserve_equations
+        )
+        
+        async with self._user_semaphore(state.user_id):
+            chunk_results = await self.enhanced_processor.process_chunks_parallel(
+                chunks,
+                state,
+                max_concurrency=max_concurrency
+            )
+        
+        merged = self.enhanced_processor.merge_chunk_results(chunks, chunk_results)
+        state.summary = merged['merged_summary']
+        state.explanation = merged['merged_explanation']
+        state.quiz_questions = merged['merged_quiz']
+        state.processing_time = datetime.now().timestamp() - state.start_time
+        
+        return self._build_processing_result(
+            state,
+            generate_summary,
+            generate_explanation,
+            generate_quiz,
+            quiz_question_count
+        )
 
 
 def get_study_helper_service(db: Session) -> StudyHelperService:
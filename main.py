@@ -1,9 +1,8 @@
 """
 EduCapture Backend Application Entry Point
 """
-from app.main import create_application
-
-app = create_application()
+# Reuse the application built in app.main rather than constructing a second one
+from app.main import app
 
 if __name__ == "__main__":
     import uvicorn
@@ -13,5 +12,9 @@ if __name__ == "__main__":
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else settings.WORKERS,
+        # uvloop is picked automatically where supported (not on Windows)
+        loop="auto",
+        http="httptools"
     )
@@ -18,7 +18,7 @@ from app.core.database import Base
 config = context.config
 
 # Set the database URL from our app configuration
-config.set_main_option('sqlalchemy.url', settings.DATABASE_URL)
+config.set_main_option('sqlalchemy.url', settings.database_url)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
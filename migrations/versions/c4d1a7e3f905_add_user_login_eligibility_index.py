@@ -0,0 +1,34 @@
+"""add_user_login_eligibility_index
+
+Revision ID: c4d1a7e3f905
+Revises: b2899ae2e31c
+Create Date: 2026-10-15 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d1a7e3f905'
+down_revision: Union[str, Sequence[str], None] = 'b2899ae2e31c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_users_id_login_eligibility',
+        'users',
+        ['id', 'status', 'is_active', 'is_email_verified'],
+        unique=False,
+        postgresql_using='btree'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_id_login_eligibility', table_name='users')
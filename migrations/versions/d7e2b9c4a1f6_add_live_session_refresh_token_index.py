@@ -0,0 +1,34 @@
+"""add_live_session_refresh_token_index
+
+Revision ID: d7e2b9c4a1f6
+Revises: c4d1a7e3f905
+Create Date: 2026-10-15 10:41:07.552918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e2b9c4a1f6'
+down_revision: Union[str, Sequence[str], None] = 'c4d1a7e3f905'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_user_sessions_refresh_token_live',
+        'user_sessions',
+        ['refresh_token'],
+        unique=False,
+        postgresql_where=sa.text('is_active AND NOT is_revoked')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_sessions_refresh_token_live', table_name='user_sessions')
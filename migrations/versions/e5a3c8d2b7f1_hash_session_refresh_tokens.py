@@ -0,0 +1,63 @@
+"""hash_session_refresh_tokens
+
+Revision ID: e5a3c8d2b7f1
+Revises: d7e2b9c4a1f6
+Create Date: 2026-10-15 11:20:36.904127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a3c8d2b7f1'
+down_revision: Union[str, Sequence[str], None] = 'd7e2b9c4a1f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user_sessions', sa.Column('refresh_token_hash', sa.LargeBinary(length=32), nullable=True))
+    # Backfill from the plaintext tokens so existing sessions keep working
+    op.execute(
+        "UPDATE user_sessions SET refresh_token_hash = sha256(convert_to(refresh_token, 'UTF8'))"
+    )
+    op.alter_column('user_sessions', 'refresh_token_hash', nullable=False)
+
+    op.drop_index('ix_user_sessions_refresh_token_live', table_name='user_sessions')
+    op.drop_index(op.f('ix_user_sessions_refresh_token'), table_name='user_sessions')
+    op.drop_column('user_sessions', 'refresh_token')
+
+    op.create_index(op.f('ix_user_sessions_refresh_token_hash'), 'user_sessions', ['refresh_token_hash'], unique=True)
+    op.create_index(
+        'ix_user_sessions_refresh_token_live',
+        'user_sessions',
+        ['refresh_token_hash'],
+        unique=False,
+        postgresql_where=sa.text('is_active AND NOT is_revoked')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Plaintext tokens cannot be recovered; the hex digest keeps the column
+    # unique and non-null, and every existing session has to log in again.
+    op.add_column('user_sessions', sa.Column('refresh_token', sa.String(length=500), nullable=True))
+    op.execute("UPDATE user_sessions SET refresh_token = encode(refresh_token_hash, 'hex')")
+    op.alter_column('user_sessions', 'refresh_token', nullable=False)
+
+    op.drop_index('ix_user_sessions_refresh_token_live', table_name='user_sessions')
+    op.drop_index(op.f('ix_user_sessions_refresh_token_hash'), table_name='user_sessions')
+    op.drop_column('user_sessions', 'refresh_token_hash')
+
+    op.create_index(op.f('ix_user_sessions_refresh_token'), 'user_sessions', ['refresh_token'], unique=True)
+    op.create_index(
+        'ix_user_sessions_refresh_token_live',
+        'user_sessions',
+        ['refresh_token'],
+        unique=False,
+        postgresql_where=sa.text('is_active AND NOT is_revoked')
+    )
@@ -0,0 +1,42 @@
+"""add_email_verification_token_index
+
+Revision ID: f1b6d3e8a2c4
+Revises: e5a3c8d2b7f1
+Create Date: 2026-10-15 12:05:18.274601
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b6d3e8a2c4'
+down_revision: Union[str, Sequence[str], None] = 'e5a3c8d2b7f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_email_verification_token',
+            'users',
+            ['email_verification_token'],
+            unique=False,
+            postgresql_where=sa.text('email_verification_token IS NOT NULL'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_users_email_verification_token',
+            table_name='users',
+            postgresql_concurrently=True
+        )
@@ -10,49 +10,40 @@ from pathlib import Path
 backend_root = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_root))
 
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 from app.core.database import engine
-from app.models.user import User
-from app.models.session import UserSession
+
+# Both counts in one roundtrip
+COUNT_SQL = text(
+    "SELECT (SELECT count(*) FROM users), (SELECT count(*) FROM user_sessions)"
+)
+# Drops every row in one statement instead of row-by-row DELETEs
+TRUNCATE_SQL = text("TRUNCATE TABLE user_sessions, users CASCADE")
 
 def delete_all_users():
     """Delete all users and their sessions from the database"""
 
-    # Create a session
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db = SessionLocal()
-
     try:
-        # Get count of users before deletion
-        user_count = db.query(User).count()
-        session_count = db.query(UserSession).count()
-
-        print(f"Found {user_count} users and {session_count} sessions in the database.")
+        with engine.begin() as conn:
+            # Get count of users before deletion
+            user_count, session_count = conn.execute(COUNT_SQL).one()
 
-        if user_count == 0:
-            print("No users found in the database.")
-            return
+            print(f"Found {user_count} users and {session_count} sessions in the database.")
 
-        # Delete all user sessions first (due to foreign key constraints)
-        print("Deleting all user sessions...")
-        db.query(UserSession).delete()
-        print(f"Deleted {session_count} user sessions.")
+            if user_count == 0:
+                print("No users found in the database.")
+                return
 
-        # Delete all users
-        print("Deleting all users...")
-        db.query(User).delete()
-        print(f"Deleted {user_count} users.")
+            # Truncate both tables in a single transaction
+            print("Deleting all users and sessions...")
+            conn.execute(TRUNCATE_SQL)
+            print(f"Deleted {user_count} users and {session_count} user sessions.")
 
-        # Commit the changes
-        db.commit()
         print("✅ All users and sessions have been successfully deleted from the database.")
 
     except Exception as e:
         print(f"❌ Error deleting users: {str(e)}")
-        db.rollback()
         raise
-    finally:
-        db.close()
 
 if __name__ == "__main__":
     print("🗑️  Starting user deletion process...")
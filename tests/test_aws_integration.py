@@ -5,37 +5,59 @@ Test S3 connectivity, file operations, and configurations
 import pytest
 import asyncio
 import io
+from pathlib import PurePath
 from unittest.mock import patch, MagicMock
 from botocore.exceptions import ClientError
 
-from app.integrations.storage.s3 import S3Storage, s3_storage
+from app.integrations.storage.s3 import S3Storage, TRANSFER_CONFIG
 from app.integrations.storage.local import LocalStorage, local_storage
 from app.core.config import settings
 
+# Payload shared by the upload tests
+TEST_FILE_CONTENT = b"test file content"
+
+# Error returned by the mocked client when the bucket is missing
+NO_SUCH_BUCKET_ERROR = ClientError(
+    {'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket does not exist'}},
+    'upload_fileobj'
+)
+
+# Settings the S3 integration cannot run without
+REQUIRED_AWS_SETTINGS = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION", "S3_BUCKET_NAME")
+
 
 class TestS3Integration:
     """Test AWS S3 integration functionality"""
     
-    @pytest.fixture
-    def mock_s3_client(self):
-        """Mock S3 client for testing"""
+    @pytest.fixture(scope="class")
+    def mocked_s3(self):
+        """Patch boto3 and build one S3Storage for the whole class"""
         with patch('boto3.Session') as mock_session:
             mock_client = MagicMock()
             mock_session.return_value.client.return_value = mock_client
-            yield mock_client
+            storage = S3Storage()
+            storage.s3_client = mock_client
+            yield mock_client, storage
     
     @pytest.fixture
-    def s3_instance(self, mock_s3_client):
-        """Create S3Storage instance with mocked client"""
-        storage = S3Storage()
-        storage.s3_client = mock_s3_client
+    def mock_s3_client(self, mocked_s3):
+        """Mock S3 client for testing, reset for each test"""
+        mock_client, _ = mocked_s3
+        mock_client.reset_mock(return_value=True, side_effect=True)
+        return mock_client
+    
+    @pytest.fixture
+    def s3_instance(self, mocked_s3, mock_s3_client):
+        """S3Storage instance with mocked client and an empty URL cache"""
+        _, storage = mocked_s3
+        storage._presigned_cache.clear()
         return storage
     
     @pytest.mark.asyncio
     async def test_s3_upload_file(self, s3_instance, mock_s3_client):
         """Test S3 file upload functionality"""
         # Prepare test data
-        test_file = io.BytesIO(b"test file content")
+        test_file = io.BytesIO(TEST_FILE_CONTENT)
         object_key = "test/test_file.txt"
         content_type = "text/plain"
         
@@ -60,14 +82,11 @@ class TestS3Integration:
     async def test_s3_upload_file_error(self, s3_instance, mock_s3_client):
         """Test S3 file upload error handling"""
         # Prepare test data
-        test_file = io.BytesIO(b"test file content")
+        test_file = io.BytesIO(TEST_FILE_CONTENT)
         object_key = "test/test_file.txt"
         
         # Mock upload error
-        mock_s3_client.upload_fileobj.side_effect = ClientError(
-            {'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket does not exist'}},
-            'upload_fileobj'
-        )
+        mock_s3_client.upload_fileobj.side_effect = NO_SUCH_BUCKET_ERROR
         
         # Test upload
         result = await s3_instance.upload_file(test_file, object_key)
@@ -93,7 +112,8 @@ class TestS3Integration:
         mock_s3_client.download_file.assert_called_once_with(
             settings.S3_BUCKET_NAME,
             object_key,
-            local_path
+            local_path,
+            Config=TRANSFER_CONFIG
         )
     
     @pytest.mark.asyncio
@@ -135,21 +155,34 @@ class TestS3Integration:
             ExpiresIn=expiration
         )
     
+    @pytest.mark.asyncio
+    async def test_s3_presigned_url_cached(self, s3_instance, mock_s3_client):
+        """Test presigned URLs are reused until the object is deleted"""
+        object_key = "test/test_file.txt"
+        mock_s3_client.generate_presigned_url.side_effect = ["https://signed/1", "https://signed/2"]
+        
+        first = await s3_instance.generate_presigned_url(object_key, 3600)
+        second = await s3_instance.generate_presigned_url(object_key, 3630)
+        assert first == second == "https://signed/1"
+        assert mock_s3_client.generate_presigned_url.call_count == 1
+        
+        await s3_instance.delete_file(object_key)
+        third = await s3_instance.generate_presigned_url(object_key, 3600)
+        assert third == "https://signed/2"
+    
     def test_s3_configuration(self):
         """Test S3 configuration settings"""
-        assert settings.AWS_ACCESS_KEY_ID is not None
-        assert settings.AWS_SECRET_ACCESS_KEY is not None
-        assert settings.AWS_REGION is not None
-        assert settings.S3_BUCKET_NAME is not None
+        missing = [name for name in REQUIRED_AWS_SETTINGS if getattr(settings, name) is None]
+        assert not missing, f"Missing AWS settings: {missing}"
 
 
 class TestLocalStorageIntegration:
     """Test local storage integration for development"""
     
-    @pytest.fixture
-    def temp_storage(self, tmp_path):
-        """Create temporary local storage instance"""
-        return LocalStorage(base_path=str(tmp_path))
+    @pytest.fixture(scope="class")
+    def temp_storage(self, tmp_path_factory):
+        """Create one temporary local storage instance for the class; each test uses its own keys"""
+        return LocalStorage(base_path=str(tmp_path_factory.mktemp("local_storage")))
     
     @pytest.mark.asyncio
     async def test_local_upload_file(self, temp_storage):
@@ -167,7 +200,7 @@ class TestLocalStorageIntegration:
         
         # Verify file exists and has correct content
         file_path = temp_storage.base_path / object_key
-        assert file_path.exists()
+        assert file_path.stat().st_size == len(test_content)
         assert file_path.read_bytes() == test_content
     
     @pytest.mark.asyncio
@@ -202,7 +235,7 @@ class TestLocalStorageIntegration:
         
         # Assertions
         assert file_path is not None
-        assert object_key.replace('/', '\\') in file_path or object_key in file_path
+        assert PurePath(file_path).as_posix().endswith(object_key)
         
         # Test non-existent file
         non_existent_path = await temp_storage.get_file_path("non/existent/file.txt")
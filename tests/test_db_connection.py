@@ -2,13 +2,31 @@
 Database Connection Tests
 Test PostgreSQL database connectivity and operations
 """
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 
-from app.core.database import engine, SessionLocal, get_db
+from app.core.database import engine, SessionLocal, get_db, db_session
 from app.core.config import settings
 
+# Probe statements, built once and reused by every test
+SELECT_ONE = text("SELECT 1")
+SELECT_VERSION = text("SELECT version()")
+SELECT_DATABASE = text("SELECT current_database()")
+SELECT_NOW = text("SELECT current_timestamp")
+
+
+@pytest.fixture(scope="module")
+def shared_session():
+    """One session reused by the read-only tests in this module"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
 
 class TestDatabaseConnection:
     """Test database connection and basic operations"""
@@ -17,32 +35,27 @@ class TestDatabaseConnection:
         """Test basic database connectivity"""
         try:
             with engine.connect() as connection:
-                result = connection.execute(text("SELECT 1"))
+                result = connection.execute(SELECT_ONE)
                 assert result.fetchone()[0] == 1
         except OperationalError as e:
             pytest.fail(f"Database connection failed: {e}")
     
-    def test_database_session(self):
+    def test_database_session(self, shared_session):
         """Test database session creation"""
-        db = SessionLocal()
-        try:
-            result = db.execute(text("SELECT version()"))
-            version = result.fetchone()[0]
-            assert "PostgreSQL" in version
-        finally:
-            db.close()
+        result = shared_session.execute(SELECT_VERSION)
+        version = result.fetchone()[0]
+        assert "PostgreSQL" in version
     
     def test_get_db_dependency(self):
         """Test database dependency injection"""
-        db_generator = get_db()
-        db = next(db_generator)
+        db = get_db()
         
         try:
-            result = db.execute(text("SELECT current_database()"))
+            result = db.execute(SELECT_DATABASE)
             db_name = result.fetchone()[0]
             assert db_name is not None
         finally:
-            next(db_generator, None)  # Close the generator
+            db_session.remove()  # Release the scoped session
     
     @pytest.mark.asyncio
     async def test_database_settings(self):
@@ -51,12 +64,12 @@ class TestDatabaseConnection:
         assert settings.DB_PORT is not None
         assert settings.DB_USER is not None
         assert settings.DB_NAME is not None
-        assert settings.DATABASE_URL is not None
+        assert settings.database_url is not None
         
-        # Verify DATABASE_URL format
-        assert "postgresql://" in settings.DATABASE_URL
-        assert settings.DB_HOST in settings.DATABASE_URL
-        assert str(settings.DB_PORT) in settings.DATABASE_URL
+        # Verify database URL format
+        assert "postgresql://" in settings.database_url
+        assert settings.DB_HOST in settings.database_url
+        assert str(settings.DB_PORT) in settings.database_url
     
     def test_database_table_creation(self, db_session):
         """Test table creation and basic CRUD operations"""
@@ -96,22 +109,19 @@ class TestDatabasePerformance:
     
     def test_connection_pool(self):
         """Test connection pooling functionality"""
-        connections = []
+        workers = 5
+        # Every worker holds its connection until all have checked one out
+        all_checked_out = threading.Barrier(workers, timeout=10)
         
-        try:
-            # Create multiple connections
-            for _ in range(5):
-                conn = engine.connect()
-                connections.append(conn)
-                
-                # Test each connection
-                result = conn.execute(text("SELECT 1"))
+        def probe(_):
+            with engine.connect() as conn:
+                result = conn.execute(SELECT_ONE)
                 assert result.fetchone()[0] == 1
-                
-        finally:
-            # Close all connections
-            for conn in connections:
-                conn.close()
+                all_checked_out.wait()
+        
+        # Check out connections from several threads at once
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(probe, range(workers)))
     
     def test_concurrent_sessions(self):
         """Test multiple concurrent database sessions"""
@@ -124,7 +134,7 @@ class TestDatabasePerformance:
                 sessions.append(session)
                 
                 # Test each session
-                result = session.execute(text("SELECT current_timestamp"))
+                result = session.execute(SELECT_NOW)
                 assert result.fetchone()[0] is not None
                 
         finally:
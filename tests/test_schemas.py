@@ -0,0 +1,49 @@
+"""
+Schema Tests
+Test request schema validation helpers
+"""
+import pytest
+from pydantic_core import PydanticCustomError
+from pydantic.networks import validate_email
+
+from app.schemas.auth import normalize_email
+
+# Addresses covering the fast path and every case it must hand to email-validator
+EMAIL_SAMPLES = [
+    "user@example.com",
+    "First.Last+tag@Sub.Example.COM",
+    " padded@example.com ",
+    "newline@example.com\n",
+    "a@xn--bcher-kva.ch",
+    "a@XN--bcher-kva.ch",
+    "a@ab--c.com",
+    "x@cb--pm.ljteeg.gog",
+    "Mh_Y@6T5.qu--k.ij",
+    "a@b-c.com",
+    "x@y.test",
+    "no-at-sign.example.com",
+    "a@b.c",
+    f"{'a' * 65}@example.com",
+]
+
+
+def _reference(value: str):
+    """Result of full email-validator normalization, or None when it rejects"""
+    try:
+        return validate_email(value)[1]
+    except PydanticCustomError:
+        return None
+
+
+class TestNormalizeEmail:
+    """Test that the email fast path matches EmailStr"""
+    
+    @pytest.mark.parametrize("value", EMAIL_SAMPLES)
+    def test_matches_validate_email(self, value):
+        """Test normalize_email agrees with validate_email on accept, reject and output"""
+        expected = _reference(value)
+        if expected is None:
+            with pytest.raises(PydanticCustomError):
+                normalize_email(value)
+        else:
+            assert normalize_email(value) == expected